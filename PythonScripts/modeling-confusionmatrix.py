@@ -1,10 +1,11 @@
+import os
 import sqlite3 as sql
 import pandas as pd
 
 
 # Read data
 print("=== Reading data")
-model_df = pd.read_pickle("../SavedData/model_df.pkl")
+model_df = pd.read_parquet("../SavedData/model_df.parquet")
 # model_df.info()
 
 # Get features and target
@@ -17,7 +18,6 @@ from sklearn.pipeline import make_pipeline, Pipeline
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from imblearn.ensemble import BalancedBaggingClassifier
-from sklearn.model_selection import cross_val_score
 from sklearn.model_selection import RepeatedStratifiedKFold
 from sklearn.ensemble import RandomForestClassifier
 from numpy import mean
@@ -47,6 +47,15 @@ full = ColumnTransformer(
     ]
 )
 
+# Cache of the fitted preprocessing: the output of the ColumnTransformer on
+# a fold is the same for every model and grid point, so it is fitted once per
+# fold and read back from disk (by any worker process) afterwards. The cache
+# is trimmed to NHL_CACHE_BYTES, least recently used entries first
+from joblib import Memory
+
+cache_bytes = os.environ.get("NHL_CACHE_BYTES", "4G")
+memory = Memory("../SavedData/pipeline_cache", verbose=0)
+
 model = RandomForestClassifier(n_estimators=10, class_weight="balanced")
 
 # Final pipeline combined with model
@@ -54,7 +63,8 @@ pipeline = Pipeline(
     steps=[
         ("preprocess", full),
         ("clf", model),
-    ]
+    ],
+    memory=memory,
 )
 
 # ## Pick best performing model and plot confusion matrix
@@ -71,23 +81,164 @@ params["clf__min_samples_leaf"] = [1, 2, 3, 4, 5]
 
 cv = RepeatedStratifiedKFold(n_splits=5, n_repeats=2, random_state=42)
 
-grid = GridSearchCV(pipeline, param_grid=params, scoring="accuracy", cv=cv, verbose=2)
+# Parallel evaluation: the (configuration, fold) fits are spread over
+# n_jobs worker processes (-1: all cores, 1: sequential, set with NHL_JOBS).
+# X and y are memory mapped once and shared read-only by the workers
+n_jobs = int(os.environ.get("NHL_JOBS", -1))
+
+# Tuning mode, set with NHL_TUNING: "grid" (exhaustive GridSearchCV, every
+# configuration fitted on all the shots) or "halving" (successive halving)
+tuning = os.environ.get("NHL_TUNING", "grid")
+
+if tuning == "halving":
+    import hashlib
+    import json
+    import math
+
+    import numpy as np
+    from joblib import Parallel, delayed
+    from sklearn.base import clone
+    from sklearn.model_selection import ParameterGrid, train_test_split
+
+    # Successive halving: every iteration evaluates the remaining
+    # configurations on a stratified subsample of shots, then keeps the best
+    # 1/factor of them for the next iteration, on a factor times larger
+    # subsample. The last iteration uses all the shots
+    factor = 3
+    candidates = list(ParameterGrid(params))
+    n_iterations = math.ceil(math.log(len(candidates), factor))
+
+    # Cross-validation scores of every (subsample size, configuration) are
+    # saved to one file as soon as all its folds are done, and read back
+    # instead of being refitted when the script is run again (delete the
+    # directory to start over)
+    checkpoint_dir = "../SavedModels/halving"
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def checkpoint_path(n_resources, candidate):
+        key = json.dumps(candidate, sort_keys=True).encode()
+        name = f"{n_resources}-{hashlib.md5(key).hexdigest()}.json"
+        return os.path.join(checkpoint_dir, name)
+
+    def save_checkpoint(n_resources, candidate, scores):
+        path = checkpoint_path(n_resources, candidate)
+        with open(path + ".tmp", "w") as f:
+            json.dump(
+                {"params": candidate, "n_resources": n_resources, "scores": scores}, f
+            )
+        os.replace(path + ".tmp", path)
+
+    def load_checkpoint(n_resources, candidate):
+        path = checkpoint_path(n_resources, candidate)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)["scores"]
+
+    # fit a configuration on one fold and return its accuracy on the held-out rows
+    def fit_and_score(candidate, X, y, train, test):
+        model = clone(pipeline).set_params(**candidate)
+        model.fit(X.iloc[train], y.iloc[train])
+        return model.score(X.iloc[test], y.iloc[test])
+
+    results = {}
+    for iteration in range(n_iterations):
+        n_resources = len(X) // factor ** (n_iterations - 1 - iteration)
+        if n_resources < len(X):
+            rows, _ = train_test_split(
+                np.arange(len(X)), train_size=n_resources, stratify=y, random_state=42
+            )
+            X_iter, y_iter = X.iloc[np.sort(rows)], y.iloc[np.sort(rows)]
+        else:
+            X_iter, y_iter = X, y
+        folds = list(cv.split(X_iter, y_iter))
+
+        scores = {i: load_checkpoint(n_resources, c) for i, c in enumerate(candidates)}
+        pending = [i for i, s in scores.items() if s is None]
+        print(
+            f"=== Iteration {iteration}: {len(candidates)} configurations on "
+            f"{n_resources} shots ({len(candidates) - len(pending)} checkpointed)"
+        )
+
+        # (configuration, fold) fits are spread over the workers as in the
+        # grid search, the folds come back in order so that a configuration
+        # is checkpointed as soon as its last fold is done
+        if pending:
+            fits = Parallel(
+                n_jobs=n_jobs,
+                max_nbytes="1M",
+                mmap_mode="r",
+                # (the sequential backend can not report the progress of a generator)
+                verbose=5 if n_jobs != 1 else 0,
+                return_as="generator",
+            )(
+                delayed(fit_and_score)(candidates[i], X_iter, y_iter, train, test)
+                for i in pending
+                for train, test in folds
+            )
+            for i in pending:
+                scores[i] = [next(fits) for _ in folds]
+                save_checkpoint(n_resources, candidates[i], scores[i])
+
+        for i, candidate in enumerate(candidates):
+            results[json.dumps(candidate, sort_keys=True)] = {
+                "params": candidate,
+                "mean_test_score": mean(scores[i]),
+                "iter": iteration,
+                "n_resources": n_resources,
+            }
+
+        # keep the best configurations for the next iteration
+        best = sorted(scores, key=lambda i: mean(scores[i]), reverse=True)
+        candidates = [candidates[i] for i in best[: math.ceil(len(best) / factor)]]
+        memory.reduce_size(bytes_limit=cache_bytes)
+
+    # Same columns as the grid search results, configurations are ranked by
+    # the last iteration they reached, then by their score in it
+    df_grid = pd.DataFrame(list(results.values()))
+    order = df_grid.sort_values(
+        ["iter", "mean_test_score"], ascending=False, kind="stable"
+    ).index
+    df_grid.loc[order, "rank_test_score"] = np.arange(1, len(df_grid) + 1)
+    df_grid["rank_test_score"] = df_grid["rank_test_score"].astype("int32")
+    df_grid = df_grid[
+        ["params", "mean_test_score", "rank_test_score", "iter", "n_resources"]
+    ]
 
-grid_result = grid.fit(X, y)
+    # refit the best configuration on all the shots
+    best_params = df_grid.loc[order[0], "params"]
+    print(f"=== Best configuration: {best_params}")
+    best_rf = clone(pipeline).set_params(**best_params).fit(X, y)
+else:
+    grid = GridSearchCV(
+        pipeline,
+        param_grid=params,
+        scoring="accuracy",
+        cv=cv,
+        verbose=2,
+        n_jobs=n_jobs,
+        pre_dispatch="2*n_jobs",
+    )
+
+    grid_result = grid.fit(X, y)
+
+    # convert results into a DataFrame
+    df_grid = pd.DataFrame(grid.cv_results_)[
+        ["params", "mean_test_score", "rank_test_score"]
+    ]
 
-# convert results into a DataFrame
-df_grid = pd.DataFrame(grid.cv_results_)[
-    ["params", "mean_test_score", "rank_test_score"]
-]
+    best_rf = grid.best_estimator_
+    memory.reduce_size(bytes_limit=cache_bytes)
 
 # df_grid.sort_values('rank_test_score')
 
 df_grid.to_pickle("../SavedModels/grid_results.pkl")
 
-best_rf = grid.best_estimator_
-
 import joblib
 
+# the saved model does not keep a reference to the local cache
+best_rf.set_params(memory=None)
+
 # save the model to disk
 filename = "../SavedModels/best_rf.sav"
 joblib.dump(best_rf, filename)
@@ -1,6 +1,8 @@
-from cgi import test
+import os
 import sqlite3 as sql
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 print("=== Connecting to database")
 
@@ -26,32 +28,52 @@ ORDER BY
     season, play_id;
 """
 
-model_df = pd.read_sql(query, con)
-
-# Numeric columns
-num_cols = [
-    "season",
-    "team_id_for",
-    "team_id_against",
-    "period",
-    "periodTime",
-    "st_x",
-    "st_y",
-]
-
-# Transform numeric columns to numeric types
-model_df[num_cols] = model_df[num_cols].apply(pd.to_numeric)
+# Compact dtypes of the modeling columns (read as strings from the database)
+dtypes = {
+    "season": "int16",
+    "team_id_for": "int16",
+    "team_id_against": "int16",
+    "period": "int8",
+    "periodTime": "int16",
+    "st_x": "float32",
+    "st_y": "float32",
+}
 
+# Fixed categories, so that every chunk has the same event encoding
+event_type = pd.CategoricalDtype(["Goal", "Missed Shot", "Shot"])
+
+# Rows per chunk: the whole result set is never held in memory, every chunk
+# is converted and appended to the Parquet file as a row group
+chunk_rows = 200_000
+model_path = "../SavedData/model_df.parquet"
+
+writer = None
+rows = 0
+for chunk in pd.read_sql(query, con, chunksize=chunk_rows):
+    # Transform numeric columns to compact numeric types
+    for col, dtype in dtypes.items():
+        chunk[col] = pd.to_numeric(chunk[col]).astype(dtype)
+    chunk["event"] = chunk["event"].astype(event_type)
+
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    if writer is None:
+        writer = pq.ParquetWriter(model_path, table.schema)
+    writer.write_table(table)
+    rows += len(chunk)
+    print(f"{rows} rows")
+
+con.close()
+# (the writer is only created with the first chunk)
+if writer is not None:
+    writer.close()
+if rows == 0:
+    raise ValueError("no shots extracted from nhl-data.db")
+
+# Read data (the compact dtypes and the event categories are kept)
+print("=== Reading data")
+model_df = pd.read_parquet(model_path)
 # model_df.info()
 
-# Get df to pickle file
-model_df.to_pickle("../SavedData/model_df.pkl")
-
-# # Read data
-# print("=== Reading data")
-# model_df = pd.read_pickle("model_df.pkl")
-# # model_df.info()
-
 # Get features and target
 X = model_df.drop("event", axis=1)
 y = model_df["event"]
@@ -62,9 +84,10 @@ from sklearn.pipeline import make_pipeline, Pipeline
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from imblearn.ensemble import BalancedBaggingClassifier
-from sklearn.model_selection import cross_val_score
 from sklearn.model_selection import RepeatedStratifiedKFold
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.base import clone
+from joblib import Parallel, delayed
 from numpy import mean
 from numpy import std
 
@@ -92,6 +115,15 @@ full = ColumnTransformer(
     ]
 )
 
+# Cache of the fitted preprocessing: the output of the ColumnTransformer on
+# a fold is the same for every model, so it is fitted once per fold and read
+# back from disk (by any worker process) afterwards. The cache is trimmed to
+# NHL_CACHE_BYTES, least recently used entries first
+from joblib import Memory
+
+cache_bytes = os.environ.get("NHL_CACHE_BYTES", "4G")
+memory = Memory("../SavedData/pipeline_cache", verbose=0)
+
 # Trying different models
 test_models = {
     "BalancedBaggingClassifier": BalancedBaggingClassifier(random_state=42),
@@ -103,35 +135,58 @@ test_models = {
     ),
 }
 
-model_list = []
-model_acc = []
+# Parallel evaluation: worker processes for the (model, fold) fits
+# (-1: all cores, 1: sequential), set with the NHL_JOBS environment variable
+n_jobs = int(os.environ.get("NHL_JOBS", -1))
+
 
-# evaluate a model
-def evaluate_model(X, y, model):
+# fit a model on one fold and return its accuracy on the held-out rows
+def fit_and_score(model, X, y, train, test):
+    model = clone(model).fit(X.iloc[train], y.iloc[train])
+    return model.score(X.iloc[test], y.iloc[test])
+
+
+# evaluate models
+def evaluate_models(X, y, models):
     # define evaluation procedure
     cv = RepeatedStratifiedKFold(n_splits=5, n_repeats=2, random_state=1)
-    # evaluate model
-    scores = cross_val_score(model, X, y, scoring="accuracy", cv=cv)
-    return scores
-
+    folds = list(cv.split(X, y))
+    # Every (model, fold) fit is a separate task, so that candidates and folds
+    # are spread over all the cores. Arrays larger than max_nbytes (the
+    # columns of X and y, the fold indices) are dumped once to memory-mapped
+    # files that the workers share read-only, instead of being pickled with
+    # every task
+    scores = Parallel(n_jobs=n_jobs, max_nbytes="1M", mmap_mode="r", verbose=5)(
+        delayed(fit_and_score)(model, X, y, train, test)
+        for model in models.values()
+        for train, test in folds
+    )
+    return {
+        name: scores[i * len(folds) : (i + 1) * len(folds)]
+        for i, name in enumerate(models)
+    }
 
-for model_name, model in test_models.items():
-    print("=== Running model: " + model_name)
-    # Define model
-    # model = BalancedBaggingClassifier()
 
-    # Final pipeline combined with model
-    pipeline = Pipeline(
+# Final pipelines combined with every model
+pipelines = {
+    model_name: Pipeline(
         steps=[
             ("preprocess", full),
             ("base", model),
-        ]
+        ],
+        memory=memory,
     )
+    for model_name, model in test_models.items()
+}
+
+print("=== Evaluating models: " + ", ".join(pipelines))
+model_scores = evaluate_models(X, y, pipelines)
+memory.reduce_size(bytes_limit=cache_bytes)
 
-    print("Evaluating model")
+model_list = []
+model_acc = []
 
-    # evaluate the model
-    scores = evaluate_model(X, y, pipeline)
+for model_name, scores in model_scores.items():
     # summarize performance
     print(model_name + "---Mean Accuracy: %.3f (%.3f)" % (mean(scores), std(scores)))
     model_list.append(model_name)
@@ -1,46 +1,59 @@
-import pandas as pd
-import pickle
-import base64
+import os
 
-# Reading saved dataframes
-df_games = pd.read_pickle("assets/df_games.data")
-df_teams_conceded = pd.read_pickle("assets/df_teams_conceded.data")
-df_teams_season = pd.read_pickle("assets/df_teams_season.data")
-shots_df = pd.read_pickle("assets/shots_df.data")
+# Folder with the dashboard data (see data.py for how it is loaded)
+ASSETS = "assets"
+
+# Backend of the shot filters (scatter plots):
+# - "memory": the memory-mapped shot store of the assets (shot_store.py)
+# - "sql": queries on the SQLite database NHL_DATABASE (sql_store.py), for
+#   deployments where the shots should not be resident in memory
+SHOTS_BACKEND = os.environ.get("NHL_SHOTS_BACKEND", "memory")
+DATABASE = os.environ.get("NHL_DATABASE", "nhl-data.db")
 
 # Rink image for background in graphs
 # IMAGE_FILENAME1 = "assets/img/NHL-rink-white.jpg"
 IMAGE_FILENAME1 = "assets/img/NHL-rink.png"
-image1 = base64.b64encode(open(IMAGE_FILENAME1, "rb").read())
-
-# Team ID dictionary
-with open("assets/team_dict.data", "rb") as f:
-    team_dict = pickle.load(f)
-
-# Preparing list of dictionaries for dropdown options
-team_options = []
-for team_id, team_name in team_dict.items():
-    my_dict = {}
-    my_dict["label"] = team_name
-    my_dict["value"] = team_id
-    team_options.append(my_dict)
-team_options = sorted(team_options, key=lambda k: k["label"])
-
-# Dropdown options for event
-event_options = []
-for e in shots_df["event"].unique():
-    my_dict = {}
-    my_dict["label"] = e
-    my_dict["value"] = e
-    event_options.append(my_dict)
-
-# Dropdown options for type
-type_options = []
-for t in shots_df["secondaryType"].unique():
-    my_dict = {}
-    my_dict["label"] = t
-    my_dict["value"] = t
-    type_options.append(my_dict)
+
+# How figures reference the rink image:
+# - "url": link to the static asset (cached by the browser, see ASSETS_MAX_AGE)
+# - "inline": base64 data URI embedded in every figure
+RINK_MODE = os.environ.get("NHL_RINK_MODE", "url")
+
+# Cache lifetime (seconds) sent with the static assets
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+# Memory bound of the figure cache of each worker, in MB (0 disables it)
+FIGURE_CACHE_MB = float(os.environ.get("NHL_FIGURE_CACHE_MB", 64))
+
+# Scatter plots with more points than this are drawn with WebGL (scattergl)
+SCATTER_WEBGL_POINTS = 1000
+
+# Above this number of shots in view, the scatter shows one marker per
+# SCATTER_CELL x SCATTER_CELL ft cell (sized by count) instead of every
+# shot. Zooming in re-renders the visible region in full detail.
+SCATTER_MAX_POINTS = 3000
+SCATTER_CELL = 2.5
+
+# Clientside mode: the browser receives one compact bundle per team and
+# filters it (season, game, shot type, event) itself, see clientside.py
+CLIENTSIDE = os.environ.get("NHL_CLIENTSIDE", "0") == "1"
+
+# Background mode: the season-wide scatter is built in a separate process
+# (Dash background callback with a diskcache manager, see background.py)
+# so the request workers stay free. Results are kept on disk for
+# BACKGROUND_EXPIRE seconds after their last use.
+BACKGROUND = os.environ.get("NHL_BACKGROUND", "0") == "1"
+BACKGROUND_CACHE = os.environ.get("NHL_BACKGROUND_CACHE", "cache")
+BACKGROUND_EXPIRE = 24 * 3600
+
+# Production server (gunicorn.conf.py): load the data in the master process
+# before forking the workers, so that they share it instead of each loading
+# its own copy
+PRELOAD = os.environ.get("NHL_PRELOAD", "1") == "1"
+
+# Expected goals (xG) model: the tuned pipeline saved by
+# PythonScripts/modeling-confusionmatrix.py, see xg.py
+XG_MODEL = os.environ.get("NHL_XG_MODEL", "../SavedModels/best_rf.sav")
 
 # Background image settings
 BG_STYLE = {
@@ -0,0 +1,153 @@
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+# pandas is imported inside the functions that build dataframes (here and in
+# the stores built on these tables, shot_store.py and sql_store.py), so that
+# opening the data at app startup does not pay for it
+
+MANIFEST = "manifest.json"
+
+
+def write_table(directory, columns, categories=None, meta=None):
+    """
+    Write a table as one `.npy` file per column plus a `manifest.json`.
+    Arguments:
+    - directory: output folder (replaced if it exists)
+    - columns: dictionary of column name -> numpy array
+    - categories: dictionary of column name -> list of labels, for columns
+      holding categorical codes (-1 for missing values)
+    - meta: optional JSON-serializable dictionary stored in the manifest
+    """
+    categories = categories or {}
+
+    # The table is written next to `directory` and swapped in at the end:
+    # running apps may have the previous files memory mapped, and writing
+    # over them in place would corrupt their data
+    staging = directory.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    manifest = {"rows": 0, "columns": [], "meta": meta or {}}
+    for name, col in columns.items():
+        np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(col))
+        entry = {"name": name, "dtype": str(col.dtype)}
+        if name in categories:
+            entry["categories"] = list(categories[name])
+        manifest["columns"].append(entry)
+        manifest["rows"] = len(col)
+
+    with open(os.path.join(staging, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+    if os.path.exists(directory):
+        old = directory.rstrip(os.sep) + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.rename(directory, old)
+        os.rename(staging, directory)
+        shutil.rmtree(old)
+    else:
+        os.rename(staging, directory)
+
+
+def write_frame(df, directory):
+    """Write a dataframe with `write_table`. Object/string columns are stored
+    as categorical codes so that every column can be memory mapped."""
+    import pandas as pd
+
+    columns = {}
+    categories = {}
+    for name in df.columns:
+        if pd.api.types.is_numeric_dtype(df[name]):
+            columns[name] = df[name].to_numpy()
+        else:
+            cat = pd.Categorical(df[name])
+            codes = cat.codes
+            columns[name] = codes.astype(
+                np.int8 if len(cat.categories) < 128 else np.int32
+            )
+            categories[name] = list(cat.categories)
+    write_table(directory, columns, categories)
+
+
+class MappedTable:
+    """
+    Read side of `write_table`. Columns are opened as read-only memory maps
+    on first access, so only the pages a callback actually reads are loaded
+    and they are shared between processes through the OS page cache.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.names = [c["name"] for c in self.manifest["columns"]]
+        self.categories = {
+            c["name"]: c["categories"]
+            for c in self.manifest["columns"]
+            if "categories" in c
+        }
+        self.meta = self.manifest["meta"]
+        self._arrays = {}
+
+    def __len__(self):
+        return self.manifest["rows"]
+
+    def column(self, name):
+        """Memory-mapped array of a column (categorical columns as codes)"""
+        if name not in self._arrays:
+            self._arrays[name] = np.load(
+                os.path.join(self.directory, f"{name}.npy"), mmap_mode="r"
+            )
+        return self._arrays[name]
+
+    def frame(self, columns=None):
+        """Materialize the given columns (default: all) as a dataframe"""
+        import pandas as pd
+
+        data = {}
+        for name in columns or self.names:
+            col = self.column(name)
+            if name in self.categories:
+                values = np.asarray(self.categories[name], dtype=object)
+                col = np.where(col >= 0, values[col], None)
+            data[name] = col
+        return pd.DataFrame(data)
+
+
+def read_frame(directory, pickle_path):
+    """Dataframe from the mapped `directory` if it exists, else from the
+    legacy pickle"""
+    import pandas as pd
+
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        return MappedTable(directory).frame()
+    return pd.read_pickle(pickle_path)
+
+
+### Convert the legacy pickles in assets/ to mapped tables
+# Usage: python asset_store.py [assets]
+if __name__ == "__main__":
+    import pandas as pd
+
+    from density import ShotDensity
+    from shot_store import ShotStore
+
+    assets = sys.argv[1] if len(sys.argv) > 1 else "assets"
+
+    for name in ["df_games", "df_teams_conceded", "df_teams_season"]:
+        write_frame(
+            pd.read_pickle(os.path.join(assets, f"{name}.data")),
+            os.path.join(assets, name),
+        )
+        print("=== Converted " + name)
+
+    shots = ShotStore.from_pickle(os.path.join(assets, "shots_df.data"))
+    shots.save(os.path.join(assets, "shots"))
+    print("=== Converted shots_df")
+
+    ShotDensity.from_store(shots).save(os.path.join(assets, "shot_density"))
+    print("=== Computed shot_density")
@@ -0,0 +1,311 @@
+// Clientside mode (NHL_CLIENTSIDE=1, see clientside.py): the figures and
+// the game dropdown are computed in the browser from the team bundle, so
+// season, game, shot type and event changes do not reach the server.
+
+(function () {
+    // px.colors.qualitative.Plotly, in the order the events first appear
+    var COLORS = ["#636efa", "#EF553B", "#00cc96", "#ab63fa", "#FFA15A"];
+    var SYMBOLS = { Shot: "x", Goal: "circle" };
+    var TRANSPARENT = "rgba(0, 0, 0, 0)";
+
+    // Typed arrays of a bundle, decoded once per bundle
+    var decoded = new WeakMap();
+
+    function decode(text, Type) {
+        var binary = atob(text);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return new Type(bytes.buffer);
+    }
+
+    function columns(bundle) {
+        var cols = decoded.get(bundle);
+        if (!cols) {
+            cols = {
+                x: decode(bundle.x, Int8Array),
+                y: decode(bundle.y, Int8Array),
+                event: decode(bundle.event, Uint8Array),
+                type: decode(bundle.type, Uint8Array),
+                game: decode(bundle.game, Uint16Array),
+            };
+            decoded.set(bundle, cols);
+        }
+        return cols;
+    }
+
+    // Rows of the shots of a season, optionally restricted to one game and
+    // to one code of the `column` ("event" or "type")
+    function rows(bundle, season, game, column, code) {
+        var cols = columns(bundle);
+        var selected = [];
+        for (var i = 0; i < bundle.rows; i++) {
+            var g = cols.game[i];
+            if (bundle.game_season[g] !== season) continue;
+            if (game !== null && bundle.games[g] !== game) continue;
+            if (cols[column][i] !== code) continue;
+            selected.push(i);
+        }
+        return selected;
+    }
+
+    // Position in the bundle's game list (-1 when "all" or unknown)
+    function gameIndex(bundle, game) {
+        if (!bundle || game === null || game === undefined || game === "all") {
+            return -1;
+        }
+        return bundle.games.indexOf(game);
+    }
+
+    function rinkImage(bundle, opacity) {
+        return {
+            source: bundle.rink,
+            xref: "x",
+            yref: "y",
+            x: -100,
+            y: 42.5,
+            sizex: 200,
+            sizey: 85,
+            sizing: "stretch",
+            opacity: opacity,
+            layer: "below",
+        };
+    }
+
+    function rinkLayout(bundle, title, opacity, template) {
+        return {
+            title: { text: title },
+            template: template,
+            images: [rinkImage(bundle, opacity)],
+            xaxis: { range: bundle.config.range_x.slice(), visible: false },
+            yaxis: { range: bundle.config.range_y.slice(), visible: false },
+            plot_bgcolor: TRANSPARENT,
+            paper_bgcolor: TRANSPARENT,
+        };
+    }
+
+    function scatter(bundle, season, type, game) {
+        if (!bundle || season === null || season === undefined) {
+            return window.dash_clientside.no_update;
+        }
+        var cols = columns(bundle);
+        var g = gameIndex(bundle, game);
+        var selected = rows(
+            bundle,
+            season,
+            g < 0 ? null : bundle.games[g],
+            "type",
+            bundle.types.indexOf(type)
+        );
+
+        // One trace per event, in order of first appearance (as px.scatter)
+        var traces = {};
+        var order = [];
+        selected.forEach(function (i) {
+            var event = bundle.events[cols.event[i]];
+            if (!traces[event]) {
+                traces[event] = { x: [], y: [] };
+                order.push(event);
+            }
+            traces[event].x.push(cols.x[i]);
+            traces[event].y.push(cols.y[i]);
+        });
+
+        var webgl = selected.length > bundle.config.webgl_points;
+        var data = order.map(function (event, k) {
+            return {
+                type: webgl ? "scattergl" : "scatter",
+                mode: "markers",
+                name: event,
+                legendgroup: event,
+                showlegend: true,
+                x: traces[event].x,
+                y: traces[event].y,
+                opacity: 0.6,
+                marker: {
+                    color: COLORS[k % COLORS.length],
+                    symbol: SYMBOLS[event] || "circle",
+                    size: 10,
+                    line: { width: 1, color: "DarkSlateGrey" },
+                },
+                hovertemplate:
+                    "event=" + event + "<br>st_x=%{x}<br>st_y=%{y}<extra></extra>",
+            };
+        });
+
+        var title = bundle.team_name + " " + season;
+        if (g >= 0) {
+            title += " Game ID: " + bundle.games[g];
+        }
+        title += " " + type + "s <br><sup>" + selected.length + " shots</sup>";
+
+        var layout = rinkLayout(bundle, title, 0.8, "plotly_white");
+        layout.legend = { title: { text: "event" } };
+        layout.uirevision = [season, bundle.team_id, type, game].join("-");
+        return { data: data, layout: layout };
+    }
+
+    function heatmap(bundle, season, event, league, leagueGrid) {
+        if (!bundle || season === null || season === undefined) {
+            return window.dash_clientside.no_update;
+        }
+        var config = bundle.config;
+        var nx = config.nbins_x;
+        var ny = config.nbins_y;
+        var stepX = (config.range_x[1] - config.range_x[0]) / nx;
+        var stepY = (config.range_y[1] - config.range_y[0]) / ny;
+
+        var name = bundle.team_name;
+        var z;
+        if (league && league.length) {
+            // Wait for the server's league-wide grid of this season/event
+            if (
+                !leagueGrid ||
+                leagueGrid.season !== season ||
+                leagueGrid.event !== event
+            ) {
+                return window.dash_clientside.no_update;
+            }
+            name = "League";
+            z = leagueGrid.z;
+        } else {
+            var cols = columns(bundle);
+            z = [];
+            for (var j = 0; j < ny; j++) {
+                z.push(new Array(nx).fill(0));
+            }
+            rows(bundle, season, null, "event", bundle.events.indexOf(event)).forEach(
+                function (i) {
+                    var bx = Math.floor((cols.x[i] - config.range_x[0]) / stepX);
+                    var by = Math.floor((cols.y[i] - config.range_y[0]) / stepY);
+                    if (bx >= 0 && bx < nx && by >= 0 && by < ny) {
+                        z[by][bx] += 1;
+                    }
+                }
+            );
+        }
+
+        var x = [];
+        var y = [];
+        for (var bx = 0; bx < nx; bx++) {
+            x.push(config.range_x[0] + stepX * (bx + 0.5));
+        }
+        for (var by = 0; by < ny; by++) {
+            y.push(config.range_y[0] + stepY * (by + 0.5));
+        }
+
+        var layout = rinkLayout(
+            bundle,
+            name + " " + season + " " + event + "s",
+            1,
+            "simple_white"
+        );
+        layout.showlegend = false;
+        return {
+            data: [
+                {
+                    type: "heatmap",
+                    x: x,
+                    y: y,
+                    z: z,
+                    colorscale: "Reds",
+                    colorbar: { title: { text: "count" } },
+                    opacity: 0.6,
+                    hovertemplate:
+                        "st_x=%{x}<br>st_y=%{y}<br>count=%{z}<extra></extra>",
+                },
+            ],
+            layout: layout,
+        };
+    }
+
+    function component(namespace, type, props) {
+        return { namespace: namespace, type: type, props: props };
+    }
+
+    function html(type, children) {
+        return component("dash_html_components", type, { children: children });
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        nhl: {
+            // Ask the server for the league-wide grid only when it is shown
+            leagueRequest: function (league, season, event) {
+                if (!league || !league.length || season === null) {
+                    return window.dash_clientside.no_update;
+                }
+                return { season: season, event: event };
+            },
+
+            games: function (bundle, season, game) {
+                var options = [];
+                if (bundle) {
+                    bundle.games.forEach(function (id, g) {
+                        if (bundle.game_season[g] === season) {
+                            options.push({ label: bundle.game_date[g], value: id });
+                        }
+                    });
+                }
+                options.push({ label: "all", value: "all" });
+                // Sorted by label as on the server, so "all" comes last
+                options.sort(function (a, b) {
+                    return String(a.label).localeCompare(String(b.label));
+                });
+
+                // Only reset the game when it is not part of the new selection
+                var valid = options.some(function (o) {
+                    return o.value === game;
+                });
+                if (game === null || game === undefined || valid) {
+                    return [options, window.dash_clientside.no_update];
+                }
+                return [options, "all"];
+            },
+
+            scatter: scatter,
+            heatmap: heatmap,
+
+            scoreBoard: function (bundle, game) {
+                var g = gameIndex(bundle, game);
+                if (g < 0) {
+                    return null;
+                }
+                return [
+                    html("H2", bundle.goals_for[g] + " x " + bundle.goals_against[g]),
+                    html(
+                        "H6",
+                        "Shots: " + bundle.shots_for[g] + " x " + bundle.shots_against[g]
+                    ),
+                    html("H4", bundle.game_venue[g]),
+                ];
+            },
+
+            teamAgainst: function (bundle, game) {
+                var g = gameIndex(bundle, game);
+                if (g < 0) {
+                    return null;
+                }
+                var dbc = "dash_bootstrap_components";
+                return component(dbc, "Card", {
+                    children: [
+                        component(dbc, "CardImg", {
+                            src:
+                                "assets/logos-Transparent/" +
+                                bundle.team_against[g] +
+                                ".png",
+                            top: true,
+                        }),
+                        component(dbc, "CardBody", {
+                            children: html("H4", bundle.team_against_name[g]),
+                        }),
+                    ],
+                    style: {
+                        "background-color": "rgba(0,0,0,0)",
+                        border: "none",
+                    },
+                });
+            },
+        },
+    });
+})();
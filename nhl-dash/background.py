@@ -0,0 +1,42 @@
+import os
+
+from CONSTANTS import ASSETS, BACKGROUND_CACHE, BACKGROUND_EXPIRE
+from asset_store import MANIFEST
+
+
+def data_version():
+    """
+    Modification time of the shots data, part of the background results
+    cache key so that figures are recomputed when the assets are rebuilt.
+    """
+    for path in [
+        os.path.join(ASSETS, "shots", MANIFEST),
+        os.path.join(ASSETS, "shots_df.data"),
+    ]:
+        if os.path.exists(path):
+            return os.path.getmtime(path)
+    return None
+
+
+def background_manager(directory=BACKGROUND_CACHE):
+    """
+    Dash background callback manager storing the jobs' progress and results
+    in a diskcache folder. Every job runs in its own process, forked from the
+    worker (so the memory-mapped data is shared with it).
+    Requires the optional dependencies of `pip install "dash[diskcache]"`.
+    Arguments:
+    - directory: folder of the disk cache
+    """
+    try:
+        import diskcache
+    except ImportError as error:
+        raise ImportError(
+            'NHL_BACKGROUND=1 requires: pip install "dash[diskcache]"'
+        ) from error
+    from dash import DiskcacheManager
+
+    return DiskcacheManager(
+        diskcache.Cache(directory),
+        cache_by=[data_version],
+        expire=BACKGROUND_EXPIRE,
+    )
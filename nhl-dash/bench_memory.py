@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+# Teams whose figures are requested to warm up the workers
+TEAM_IDS = [1, 6, 10, 20]
+SHOT_TYPE = "Wrist Shot"
+EVENT = "Goal"
+
+
+def memory(pid):
+    """
+    USS (private memory), PSS (proportional share) and RSS of a process in
+    kB, from /proc/<pid>/smaps_rollup (Linux only)
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0])
+    return {
+        "uss": fields["Private_Clean"] + fields["Private_Dirty"],
+        "pss": fields["Pss"],
+        "rss": fields["Rss"],
+    }
+
+
+def children(pid):
+    """Process ids of the children of `pid` (the gunicorn workers)"""
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            pids.extend(int(child) for child in f.read().split())
+    return pids
+
+
+def callback(url, output, inputs, state=()):
+    """
+    Call a Dash callback over HTTP.
+    `inputs` and `state` are lists of (id, property, value)
+    """
+    outputs = [
+        {"id": name, "property": prop}
+        for name, prop in (out.split(".") for out in output.strip(".").split("..."))
+    ]
+    body = {
+        "output": output,
+        # Single output callbacks take the output itself instead of a list
+        "outputs": outputs if output.startswith("..") else outputs[0],
+        "inputs": [
+            {"id": name, "property": prop, "value": value}
+            for name, prop, value in inputs
+        ],
+        "changedPropIds": [f"{name}.{prop}" for name, prop, _ in inputs[:1]],
+        "state": [
+            {"id": name, "property": prop, "value": value}
+            for name, prop, value in state
+        ],
+    }
+    request = urllib.request.Request(
+        url + "/_dash-update-component",
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())["response"]
+
+
+def warm_up(url, rounds):
+    """Request the layout and the main figures of TEAM_IDS `rounds` times
+    (the requests are spread over the workers by gunicorn)"""
+    for _ in range(rounds):
+        urllib.request.urlopen(url + "/_dash-layout").read()
+        for team_id in TEAM_IDS:
+            seasons = callback(
+                url,
+                "..season-choice.options...season-choice.value..",
+                [("team-choice", "value", team_id)],
+                [("season-choice", "value", None)],
+            )["season-choice"]["options"]
+            season = seasons[-1]["value"]
+            selection = callback(
+                url,
+                "selection.data",
+                [
+                    ("team-choice", "value", team_id),
+                    ("season-choice", "value", season),
+                ],
+                [("selection", "data", None)],
+            )["selection"]["data"]
+            callback(
+                url,
+                "scatter-types.figure",
+                [
+                    ("selection", "data", selection),
+                    ("type-choice", "value", SHOT_TYPE),
+                    ("game-choice", "value", "all"),
+                    ("scatter-types", "relayoutData", None),
+                ],
+            )
+            callback(
+                url,
+                "heatmap-events.figure",
+                [
+                    ("selection", "data", selection),
+                    ("event-choice", "value", EVENT),
+                    ("heatmap-league", "value", []),
+                ],
+            )
+
+
+def measure(workers, preload, port, rounds):
+    """Start gunicorn, warm up its workers and return the master's and
+    every worker's memory (see `memory`)"""
+    env = dict(
+        os.environ,
+        NHL_WORKERS=str(workers),
+        NHL_PRELOAD="1" if preload else "0",
+        NHL_BIND=f"127.0.0.1:{port}",
+    )
+    url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:server"],
+        env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        # Wait until the workers answer
+        for _ in range(600):
+            try:
+                urllib.request.urlopen(url + "/_dash-layout").read()
+                break
+            except OSError:
+                time.sleep(0.5)
+        else:
+            raise RuntimeError("gunicorn did not start")
+
+        warm_up(url, rounds)
+        return memory(process.pid), [memory(pid) for pid in children(process.pid)]
+    finally:
+        process.terminate()
+        process.wait()
+
+
+### Measure the memory of each gunicorn worker, with and without preload
+# Usage: python bench_memory.py [--workers N] [--rounds N]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8051)
+    args = parser.parse_args()
+
+    print(
+        f"{'preload':>8}{'process':>10}{'USS (MB)':>10}{'PSS (MB)':>10}{'RSS (MB)':>10}"
+    )
+    for preload in [True, False]:
+        master, workers = measure(args.workers, preload, args.port, args.rounds)
+        rows = [("master", master)] + [
+            (f"worker {i}", w) for i, w in enumerate(workers)
+        ]
+        for name, mem in rows:
+            print(
+                f"{str(preload):>8}{name:>10}"
+                + "".join(f"{mem[k] / 1e3:10.1f}" for k in ["uss", "pss", "rss"])
+            )
+        total = sum(mem["pss"] for _, mem in rows)
+        print(f"{str(preload):>8}{'total PSS':>10}{'':>10}{total / 1e3:10.1f}")
@@ -0,0 +1,34 @@
+import gzip
+
+from data import get_data
+from functions import plot_heatmap_from_df, plot_shot_type
+
+# Selection used for the measurement
+TEAM_ID = 20
+EVENT = "Goal"
+SHOT_TYPE = "Wrist Shot"
+
+
+def payload_size(fig):
+    """Size in bytes of a figure response (raw JSON, gzip compressed)"""
+    body = fig.to_json().encode()
+    return len(body), len(gzip.compress(body))
+
+
+### Compare figure payloads with the rink image inlined or linked
+# Usage: python bench_payload.py
+if __name__ == "__main__":
+    data = get_data()
+    season = data.options.seasons(TEAM_ID)[-1]["value"]
+
+    figures = {
+        "heatmap": lambda: plot_heatmap_from_df(season, TEAM_ID, EVENT),
+        "scatter": lambda: plot_shot_type(season, TEAM_ID, SHOT_TYPE),
+    }
+
+    print(f"{'figure':10}{'rink':>8}{'json (kB)':>12}{'gzip (kB)':>12}")
+    for name, make_figure in figures.items():
+        for mode in ["inline", "url"]:
+            data.rink_mode = mode
+            raw, compressed = payload_size(make_figure())
+            print(f"{name:10}{mode:>8}{raw / 1e3:12.1f}{compressed / 1e3:12.1f}")
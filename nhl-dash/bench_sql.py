@@ -0,0 +1,72 @@
+import argparse
+import statistics
+import time
+
+from data import get_data
+from sql_store import SqlShotStore
+
+# Filters of the dashboard callbacks, for every team of the sample
+SHOT_TYPE = "Wrist Shot"
+EVENT = "Goal"
+TEAM_IDS = [1, 6, 10, 20]
+
+
+def selections(data):
+    """Filters (keyword arguments of `select`) requested by the scatter and
+    heatmap callbacks for the last three seasons of every team of TEAM_IDS"""
+    filters = []
+    for team_id in TEAM_IDS:
+        for season in [s["value"] for s in data.options.seasons(team_id)[-3:]]:
+            game = data.options.games(team_id, season)[0]["value"]
+            filters += [
+                dict(season=season, team_id_for=team_id, secondaryType=SHOT_TYPE),
+                dict(season=season, team_id_for=team_id, event=EVENT),
+                dict(
+                    season=season,
+                    team_id_for=team_id,
+                    secondaryType=SHOT_TYPE,
+                    game_id=game,
+                ),
+            ]
+    return filters
+
+
+def timings(store, filters, repeat):
+    """Milliseconds of every `store.select` call and the rows returned"""
+    times = []
+    rows = []
+    for _ in range(repeat):
+        for conditions in filters:
+            start = time.perf_counter()
+            df = store.select(**conditions)
+            times.append((time.perf_counter() - start) * 1e3)
+            rows.append(len(df))
+    return times, rows
+
+
+### Compare the shot filters on the in-memory store and on SQLite
+# Usage: python bench_sql.py nhl-data.db [--repeat N]
+# (create the indexes first with: python sql_store.py nhl-data.db)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("database", help="SQLite database (nhl-data.db)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = get_data()
+    filters = selections(data)
+    stores = {
+        "memory": data.shots,
+        "sql": SqlShotStore(args.database, data.shots.categories),
+    }
+
+    print(f"{len(filters)} filters x {args.repeat}")
+    print(f"{'backend':10}{'first (ms)':>12}{'median (ms)':>12}{'p95 (ms)':>12}")
+    results = {}
+    for name, store in stores.items():
+        times, results[name] = timings(store, filters, args.repeat)
+        p95 = statistics.quantiles(times, n=20)[-1]
+        print(f"{name:10}{times[0]:12.2f}{statistics.median(times):12.2f}{p95:12.2f}")
+
+    if results["memory"] != results["sql"]:
+        print("!!! Different number of rows between the backends")
@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import pickle
+import sqlite3
+
+import pandas as pd
+
+from asset_store import read_frame, write_frame
+from density import ShotDensity
+from score_xg import score_shots
+from shot_store import ShotStore
+from team_stats import GOALS_QUERY, TEAM_STATS_QUERY, refresh_team_stats
+
+# Build state (high-water mark of the processed games), kept with the assets
+BUILD_STATE = "build.json"
+
+# Layout of the built assets. Assets of another version are rebuilt in full
+# (2: shots with the period and periodTime features of the xG model)
+BUILD_VERSION = 2
+
+#####################################
+# Queries (same as Notebooks/SettingUpDash.ipynb). Every query over games
+# or plays only reads the games after the high-water mark `?`
+TEAMS_QUERY = """
+SELECT
+	team_id, shortName || ' ' || teamName AS name
+FROM
+	team_info
+ORDER BY
+	team_id ASC;
+"""
+
+GAMES_QUERY = """
+SELECT
+	game_id, home_team_id, away_team_id, venue,
+	SUBSTR(season, 1, 4) AS season,
+	SUBSTR(date_time_GMT, 1, 10) AS date
+FROM
+	game
+WHERE
+	game_id > ?
+ORDER BY
+	game_id;
+"""
+
+SHOTS_QUERY = """
+SELECT
+    SUBSTR(game_id, 1, 4) AS season,
+    game_id, team_id_for, team_id_against,
+    event, secondaryType,
+    period, periodTime,
+    st_x, st_y
+FROM
+    game_plays
+WHERE
+    game_id > ?
+    AND
+        event IN ('Goal', 'Shot', 'Missed Shot')
+    AND
+        (x <> 'NA' AND y <> 'NA')
+ORDER BY
+    game_id, play_id;
+"""
+
+# Goal tables: (asset name, count column, side), see GOALS_QUERY in team_stats.py
+GOAL_TABLES = [
+    ("df_teams_season", "number_of_goals", "for"),
+    ("df_teams_conceded", "goals_conceded", "against"),
+]
+
+
+def read_state(assets):
+    """Build state of `assets`, or None if they were not built by this script"""
+    path = os.path.join(assets, BUILD_STATE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def build(database, assets, full=False, xg_model=None):
+    """
+    Extract the dashboard assets from the SQLite `database` into `assets`.
+    Only the games after the high-water mark of the previous build (the
+    largest game_id, game ids grow with the season) are read and merged
+    into the existing assets, unless `full` is True or `assets` were not
+    built by this function (or by an older version of it).
+    If `xg_model` is given, the new shots are scored with it (see
+    score_xg.py).
+    Returns the new build state.
+    """
+    state = None if full else read_state(assets)
+    if state and state.get("version") != BUILD_VERSION:
+        print(f"=== Assets of build version {state.get('version')}, rebuilding all")
+        state = None
+    since = state["max_game_id"] if state else 0
+
+    def path(name):
+        return os.path.join(assets, name)
+
+    os.makedirs(assets, exist_ok=True)
+    con = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+
+    # Team names: a small table, always read in full
+    team_dict = dict(pd.read_sql(TEAMS_QUERY, con).values)
+    with open(path("team_dict.data"), "wb") as f:
+        pickle.dump(team_dict, f)
+
+    new_games = pd.read_sql(GAMES_QUERY, con, params=(since,))
+    if new_games.empty:
+        print(f"=== No game after {since}")
+        return state
+    print(f"=== {len(new_games)} new games after {since}")
+
+    games = new_games
+    if state:
+        old = read_frame(path("df_games"), path("df_games.data"))
+        games = pd.concat([old.astype(new_games.dtypes), new_games])
+        games = games.drop_duplicates("game_id", keep="last")
+    write_frame(games.sort_values("game_id").reset_index(drop=True), path("df_games"))
+
+    # Season aggregates: refreshed in the database (one scan of the new
+    # plays), then the dashboard tables are read from the small table
+    refresh_team_stats(sqlite3.connect(database), full=full)
+    for name, count, side in GOAL_TABLES:
+        query = GOALS_QUERY.format(count=count, side=side)
+        write_frame(pd.read_sql(query, con), path(name))
+    write_frame(pd.read_sql(TEAM_STATS_QUERY, con), path("team_season_stats"))
+    print("=== Updated team_season_stats")
+
+    shots = ShotStore.from_frame(pd.read_sql(SHOTS_QUERY, con, params=(since,)))
+    print(f"=== {len(shots)} new shots")
+    if state:
+        shots = ShotStore.load(path("shots")).concat(shots)
+    if xg_model:
+        scored = score_shots(shots, xg_model)
+        print(f"=== Scored {scored} shots with {xg_model}")
+    shots.save(path("shots"))
+
+    # Recomputed in one bincount pass over all the shots (seasons and teams
+    # of the new games may not be in the previous cube)
+    ShotDensity.from_store(shots).save(path("shot_density"))
+    print("=== Computed shot_density")
+
+    state = {
+        "version": BUILD_VERSION,
+        "database": os.path.abspath(database),
+        "max_game_id": int(games["game_id"].max()),
+        "max_season": int(games["season"].astype(int).max()),
+        "games": len(games),
+        "shots": len(shots),
+    }
+    with open(path(BUILD_STATE), "w") as f:
+        json.dump(state, f, indent=1)
+    return state
+
+
+### Build or update the dashboard assets from the SQLite database
+# Usage: python build_assets.py nhl-data.db [--assets assets] [--full]
+#          [--xg ../SavedModels/best_rf.sav]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("database", help="SQLite database (nhl-data.db)")
+    parser.add_argument("--assets", default="assets")
+    parser.add_argument(
+        "--full", action="store_true", help="ignore the previous build and redo all"
+    )
+    parser.add_argument("--xg", help="xG model to score the new shots with")
+    args = parser.parse_args()
+
+    print(build(args.database, args.assets, args.full, args.xg))
@@ -0,0 +1,80 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Default budget for importing the app module (seconds), once the framework
+# below is imported: the time the app itself adds to the startup
+STARTUP_BUDGET = 1.0
+
+APP_SCRIPT = "nhl-dash-app-modular.py"
+
+# Framework imported by any Dash app (most of the startup time), timed apart
+FRAMEWORK = ["dash", "dash_bootstrap_components"]
+
+# Imports the framework, then the app module without starting the server,
+# and prints the wall time of both
+CHILD = """
+import importlib, importlib.util, time
+start = time.perf_counter()
+for name in {framework!r}:
+    importlib.import_module(name)
+framework = time.perf_counter() - start
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("nhl_dash_app", {script!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(framework, time.perf_counter() - start)
+"""
+
+
+def import_times(script=APP_SCRIPT):
+    """
+    Import FRAMEWORK then `script` in a fresh interpreter with
+    `python -X importtime`. Returns the wall times of the framework and of
+    the app import (seconds) and a list of (cumulative seconds, module) for
+    the top-level imports.
+    """
+    child = CHILD.format(framework=FRAMEWORK, script=script)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", child],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # Nested imports are indented below the module importing them
+        if not name[1:].startswith(" "):
+            modules.append((int(cumulative) / 1e6, name.strip()))
+
+    framework, app = result.stdout.strip().splitlines()[-1].split()
+    return float(framework), float(app), modules
+
+
+### Report app startup time against a budget
+# Usage: python check_startup.py [--budget SECONDS] [--top N]
+# The budget is checked against the app's own import time, after FRAMEWORK
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    framework, wall, modules = import_times()
+
+    print(f"=== Slowest top-level imports of {APP_SCRIPT}")
+    for seconds, name in sorted(modules, reverse=True)[: args.top]:
+        print(f"{seconds:8.3f}s  {name}")
+
+    print(f"=== Framework ({', '.join(FRAMEWORK)}): {framework:.3f}s")
+    print(f"=== App startup: {wall:.3f}s (budget {args.budget:.3f}s)")
+    if wall > args.budget:
+        print("=== Over budget!")
+        sys.exit(1)
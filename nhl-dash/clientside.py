@@ -0,0 +1,157 @@
+import base64
+from functools import lru_cache
+
+import numpy as np
+from dash import ClientsideFunction, no_update
+from dash.dependencies import Input, Output, State
+
+from CONSTANTS import SCATTER_WEBGL_POINTS
+from data import get_data
+from density import NBINS_X, NBINS_Y, RANGE_X, RANGE_Y
+
+# Clientside mode: on team selection the server sends one compact bundle with
+# all the shots of the team (typed arrays, base64 encoded), and the season,
+# game, shot type and event filtering plus the figures are done in the
+# browser by the functions of assets/clientside.js
+
+
+def encode(array, dtype):
+    """Base64 string of the little-endian bytes of `array` as `dtype`"""
+    return base64.b64encode(np.ascontiguousarray(array, dtype=dtype).tobytes()).decode()
+
+
+@lru_cache(maxsize=16)
+def team_bundle(team_id):
+    """
+    Compact bundle with every shot of `team_id` (all seasons):
+    - x, y: rink coordinates as int8
+    - event, type: event/secondaryType codes as uint8 (255 if missing)
+    - game: index of the shot's game in `games`, as uint16
+    plus, per game, its season, date and the score board data.
+    """
+    data = get_data()
+    shots = data.shots
+
+    # Rows are sorted by team first, so all the team's partitions are contiguous
+    ranges = [rows for (team, _), rows in shots.index.items() if team == team_id]
+    if not ranges:
+        return None
+    rows = slice(min(r[0] for r in ranges), max(r[1] for r in ranges))
+
+    games, game = np.unique(shots.columns["game_id"][rows], return_inverse=True)
+
+    # Score board of each game from the team's point of view
+    pos = data.games.positions(games)
+    home = data.games.columns["home_team_id"][pos] == team_id
+    columns = {**data.games.columns, **data.summary.columns}
+
+    def side(team, other):
+        """Per game values of the `team` side (home or away) and the other"""
+        return np.where(home, columns[team][pos], columns[other][pos]).tolist()
+
+    team_against = side("away_team_id", "home_team_id")
+
+    return {
+        "team_id": team_id,
+        "team_name": data.team_dict[team_id],
+        "rink": data.rink_source,
+        "config": {
+            "webgl_points": SCATTER_WEBGL_POINTS,
+            "nbins_x": NBINS_X,
+            "nbins_y": NBINS_Y,
+            "range_x": RANGE_X,
+            "range_y": RANGE_Y,
+        },
+        "events": shots.categories["event"],
+        "types": shots.categories["secondaryType"],
+        "rows": rows.stop - rows.start,
+        "x": encode(np.round(shots.columns["st_x"][rows]), "<i1"),
+        "y": encode(np.round(shots.columns["st_y"][rows]), "<i1"),
+        "event": encode(shots.columns["event"][rows], "<u1"),
+        "type": encode(shots.columns["secondaryType"][rows], "<u1"),
+        "game": encode(game, "<u2"),
+        "games": games.tolist(),
+        "game_season": (games // 1000000).tolist(),
+        "game_date": data.games.lookup(games, "date").tolist(),
+        "game_venue": data.games.lookup(games, "venue").tolist(),
+        "team_against": team_against,
+        "team_against_name": [data.team_dict.get(t) for t in team_against],
+        "goals_for": side("home_goals", "away_goals"),
+        "goals_against": side("away_goals", "home_goals"),
+        "shots_for": side("home_shots", "away_shots"),
+        "shots_against": side("away_shots", "home_shots"),
+    }
+
+
+def register(app):
+    """Add the clientside mode callbacks to `app`. The server-side callbacks
+    they replace must not be registered (see `server_only` in the app)."""
+
+    # The only request per team selection
+    @app.callback(Output("team-bundle", "data"), Input("team-choice", "value"))
+    def get_team_bundle(team_id):
+        return team_bundle(team_id)
+
+    # League-wide heatmap: the browser only asks for it when the toggle is on
+    @app.callback(
+        Output("league-grid", "data"),
+        Input("league-request", "data"),
+        prevent_initial_call=True,
+    )
+    def get_league_grid(request):
+        if not request:
+            return no_update
+        grid = get_data().density.grid(request["season"], request["event"])
+        if grid is None:
+            return None
+        return {**request, "z": grid.T.tolist()}
+
+    def clientside(name, *dependencies):
+        app.clientside_callback(
+            ClientsideFunction(namespace="nhl", function_name=name), *dependencies
+        )
+
+    clientside(
+        "leagueRequest",
+        Output("league-request", "data"),
+        Input("heatmap-league", "value"),
+        Input("season-choice", "value"),
+        Input("event-choice", "value"),
+    )
+    clientside(
+        "games",
+        Output("game-choice", "options"),
+        Output("game-choice", "value"),
+        Input("team-bundle", "data"),
+        Input("season-choice", "value"),
+        State("game-choice", "value"),
+    )
+    clientside(
+        "scatter",
+        Output("scatter-types", "figure"),
+        Input("team-bundle", "data"),
+        Input("season-choice", "value"),
+        Input("type-choice", "value"),
+        Input("game-choice", "value"),
+    )
+    clientside(
+        "heatmap",
+        Output("heatmap-events", "figure"),
+        Input("team-bundle", "data"),
+        Input("season-choice", "value"),
+        Input("event-choice", "value"),
+        Input("heatmap-league", "value"),
+        Input("league-grid", "data"),
+    )
+    clientside(
+        "scoreBoard",
+        Output("score-board", "children"),
+        Input("team-bundle", "data"),
+        Input("game-choice", "value"),
+    )
+    clientside(
+        "teamAgainst",
+        Output("team-against", "children"),
+        Input("team-bundle", "data"),
+        Input("game-choice", "value"),
+    )
@@ -0,0 +1,218 @@
+import base64
+import os
+import pickle
+import threading
+from functools import cached_property
+
+from CONSTANTS import ASSETS, DATABASE, IMAGE_FILENAME1, RINK_MODE, SHOTS_BACKEND
+
+
+class DashData:
+    """
+    Data used by the dashboard callbacks. Every dataset is loaded the first
+    time it is accessed, so importing the app (and serving the layout, which
+    only needs the dropdown labels) does not read the large assets.
+    Arguments:
+    - assets: folder with the dashboard assets
+    - rink_mode: "url" or "inline", see `rink_source`
+    """
+
+    def __init__(self, assets=ASSETS, rink_mode=RINK_MODE):
+        self.assets = assets
+        self.rink_mode = rink_mode
+
+    def path(self, name):
+        return os.path.join(self.assets, name)
+
+    # Reading saved dataframes. Memory-mapped tables are used when they have
+    # been generated with asset_store.py, otherwise the legacy pickles
+    @cached_property
+    def df_games(self):
+        from asset_store import read_frame
+
+        return read_frame(self.path("df_games"), self.path("df_games.data"))
+
+    @cached_property
+    def df_teams_conceded(self):
+        from asset_store import read_frame
+
+        return read_frame(
+            self.path("df_teams_conceded"), self.path("df_teams_conceded.data")
+        )
+
+    @cached_property
+    def df_teams_season(self):
+        from asset_store import read_frame
+
+        return read_frame(
+            self.path("df_teams_season"), self.path("df_teams_season.data")
+        )
+
+    @cached_property
+    def team_stats(self):
+        """Goals and shots per team and season (see team_stats.py). Built
+        from the two legacy goal tables when the assets have no
+        team_season_stats table"""
+        from asset_store import MANIFEST, MappedTable
+
+        if os.path.exists(os.path.join(self.path("team_season_stats"), MANIFEST)):
+            return MappedTable(self.path("team_season_stats")).frame()
+
+        keys = ["season", "team_id"]
+        scored = self.df_teams_season.rename(columns={"number_of_goals": "goals_for"})
+        conceded = self.df_teams_conceded.rename(
+            columns={"goals_conceded": "goals_against"}
+        )
+        stats = scored[keys + ["goals_for"]].merge(
+            conceded[keys + ["goals_against"]], on=keys, how="outer"
+        )
+        stats["season"] = stats["season"].astype(int)
+        return stats.fillna(0).sort_values(["team_id", "season"])
+
+    @cached_property
+    def games(self):
+        """Games indexed by game_id (see games.py)"""
+        from games import GameIndex
+
+        return GameIndex(self.df_games)
+
+    @cached_property
+    def summary(self):
+        """Per-game score and shots summary (see games.py)"""
+        from games import GameSummary
+
+        return GameSummary(
+            self.games, self.shot_table("game_id", "team_id_for", "event")
+        )
+
+    @cached_property
+    def shots(self):
+        """Compact shot store (memory mapped). Converted from the legacy
+        shots_df pickle when assets/shots has not been generated"""
+        from shot_store import ShotStore
+
+        if os.path.exists(self.path("shots")):
+            return ShotStore.load(self.path("shots"))
+        return ShotStore.from_pickle(self.path("shots_df.data"))
+
+    @cached_property
+    def shot_source(self):
+        """Store answering the shot filters of the callbacks: the shot store,
+        or the SQLite database when SHOTS_BACKEND is "sql" (see sql_store.py).
+        In SQL mode the labels of the categorical columns are read from the
+        manifest of assets/shots (no column is opened), or else queried"""
+        if SHOTS_BACKEND == "sql":
+            from asset_store import MANIFEST, MappedTable
+            from sql_store import SqlShotStore
+
+            categories = None
+            if os.path.exists(os.path.join(self.path("shots"), MANIFEST)):
+                categories = MappedTable(self.path("shots")).categories
+            return SqlShotStore(DATABASE, categories)
+        return self.shots
+
+    def shot_table(self, *columns):
+        """Shots the precomputed tables are built from: the shot store, or in
+        SQL mode the number of shots per distinct value of `columns` (see
+        SqlShotStore.counts), so that the shots are never loaded"""
+        if SHOTS_BACKEND == "sql":
+            return self.shot_source.counts(*columns)
+        return self.shots
+
+    @cached_property
+    def density(self):
+        """Shot counts cube for the heatmaps (see density.py). Computed from
+        the shots (see `shot_table`) when assets/shot_density has not been
+        generated"""
+        from density import ShotDensity
+
+        if os.path.exists(self.path("shot_density")):
+            return ShotDensity.load(self.path("shot_density"))
+        return ShotDensity.from_store(
+            self.shot_table("season", "team_id_for", "event", "st_x", "st_y")
+        )
+
+    @cached_property
+    def options(self):
+        """Season and game dropdown options (see options.py)"""
+        from options import OptionsCatalogue
+
+        return OptionsCatalogue(
+            self.shot_table("team_id_for", "season", "game_id"), self.games
+        )
+
+    @cached_property
+    def image1(self):
+        """Rink image for background in graphs"""
+        with open(IMAGE_FILENAME1, "rb") as f:
+            return base64.b64encode(f.read())
+
+    @cached_property
+    def rink_url(self):
+        """Static asset URL of the rink image. The modification time is added
+        as version so the long-lived browser cache is refreshed on change"""
+        return f"{IMAGE_FILENAME1}?v={int(os.path.getmtime(IMAGE_FILENAME1))}"
+
+    @property
+    def rink_source(self):
+        """Source of the rink layout image according to `rink_mode`"""
+        if self.rink_mode == "inline":
+            return "data:image/png;base64,{}".format(self.image1.decode())
+        return self.rink_url
+
+    @cached_property
+    def team_dict(self):
+        """Team ID dictionary"""
+        with open(self.path("team_dict.data"), "rb") as f:
+            return pickle.load(f)
+
+    # Dropdown options
+    @cached_property
+    def team_options(self):
+        return sorted(
+            [
+                {"label": name, "value": team_id}
+                for team_id, name in self.team_dict.items()
+            ],
+            key=lambda k: k["label"],
+        )
+
+    @cached_property
+    def event_options(self):
+        categories = self.shot_source.categories
+        return [{"label": e, "value": e} for e in categories["event"]]
+
+    @cached_property
+    def type_options(self):
+        categories = self.shot_source.categories
+        return [{"label": t, "value": t} for t in categories["secondaryType"]]
+
+    def preload(self):
+        """Load every dataset now instead of on first use"""
+        for name in [
+            "df_games",
+            "games",
+            "df_teams_conceded",
+            "df_teams_season",
+            "team_stats",
+            "shot_source",
+            "options",
+            "density",
+            "summary",
+        ]:
+            getattr(self, name)
+        return self
+
+
+_data = None
+_data_lock = threading.Lock()
+
+
+def get_data():
+    """Application data context, created on the first call and shared
+    afterwards (datasets inside it are loaded lazily)"""
+    global _data
+    with _data_lock:
+        if _data is None:
+            _data = DashData()
+    return _data
@@ -0,0 +1,139 @@
+import numpy as np
+
+from asset_store import MappedTable, write_table
+
+# Heatmap bins over the rink (same grid as the previous density_heatmap)
+NBINS_X = 80
+NBINS_Y = 40
+RANGE_X = (-100, 100)
+RANGE_Y = (-45, 45)
+
+
+class ShotDensity:
+    """
+    Precomputed shot counts on the heatmap grid, as an integer cube indexed
+    by season x team x event x NBINS_X x NBINS_Y, plus the league-wide
+    totals (summed over teams) per season x event. When the shots have been
+    scored (see score_xg.py) the expected goals are summed in the same bins.
+    Arguments:
+    - counts: uint16 cube of shape (seasons, teams, events, NBINS_X, NBINS_Y)
+    - seasons: sorted season of every first-axis entry
+    - teams: sorted team_id_for of every second-axis entry
+    - events: event label of every third-axis entry
+    - xg (optional): float32 cube of the same shape with the summed xG
+    """
+
+    def __init__(self, counts, seasons, teams, events, xg=None):
+        self.counts = counts
+        self.league = counts.sum(axis=1, dtype=np.int32)
+        self.xg = xg
+        self.league_xg = None if xg is None else xg.sum(axis=1, dtype=np.float32)
+        self.seasons = list(seasons)
+        self.teams = list(teams)
+        self.events = list(events)
+
+    @classmethod
+    def from_store(cls, shots):
+        """Bin every shot of a ShotStore in one `np.bincount` pass (or the
+        ShotCounts of season, team_id_for, event, st_x, st_y in SQL mode,
+        see sql_store.py)"""
+        seasons, season_idx = np.unique(shots.columns["season"], return_inverse=True)
+        teams, team_idx = np.unique(shots.columns["team_id_for"], return_inverse=True)
+        events = shots.categories["event"]
+        event_idx = shots.columns["event"]
+
+        x = shots.columns["st_x"]
+        y = shots.columns["st_y"]
+        bin_x = np.floor((x - RANGE_X[0]) / (RANGE_X[1] - RANGE_X[0]) * NBINS_X)
+        bin_y = np.floor((y - RANGE_Y[0]) / (RANGE_Y[1] - RANGE_Y[0]) * NBINS_Y)
+
+        # Shots outside the rink or without an event are not counted
+        valid = (
+            (bin_x >= 0)
+            & (bin_x < NBINS_X)
+            & (bin_y >= 0)
+            & (bin_y < NBINS_Y)
+            & (event_idx >= 0)
+        )
+
+        shape = (len(seasons), len(teams), len(events), NBINS_X, NBINS_Y)
+        flat = np.ravel_multi_index(
+            (
+                season_idx[valid],
+                team_idx[valid],
+                event_idx[valid],
+                bin_x[valid].astype(np.int64),
+                bin_y[valid].astype(np.int64),
+            ),
+            shape,
+        )
+        count = shots.columns.get("count")
+        counts = np.bincount(
+            flat,
+            weights=None if count is None else count[valid],
+            minlength=np.prod(shape),
+        )
+
+        # xG cube only when every shot has been scored
+        xg = shots.columns.get("xg")
+        if xg is not None and not np.isnan(xg).any():
+            weights = xg[valid].astype(np.float64)
+            xg = np.bincount(flat, weights=weights, minlength=np.prod(shape))
+            xg = xg.astype(np.float32).reshape(shape)
+        else:
+            xg = None
+        return cls(counts.astype(np.uint16).reshape(shape), seasons, teams, events, xg)
+
+    @classmethod
+    def load(cls, directory):
+        """Open a cube saved with `save` (memory mapped)"""
+        table = MappedTable(directory)
+        meta = table.meta
+        counts = table.column("counts").reshape(meta["shape"])
+        xg = table.column("xg").reshape(meta["shape"]) if "xg" in table.names else None
+        return cls(counts, meta["seasons"], meta["teams"], meta["events"], xg)
+
+    def save(self, directory):
+        columns = {"counts": self.counts.ravel()}
+        if self.xg is not None:
+            columns["xg"] = self.xg.ravel()
+        write_table(
+            directory,
+            columns,
+            meta={
+                "shape": list(self.counts.shape),
+                "seasons": [int(s) for s in self.seasons],
+                "teams": [int(t) for t in self.teams],
+                "events": self.events,
+            },
+        )
+
+    def grid(self, season, event, team_id=None, xg=False):
+        """
+        Counts of shape (NBINS_X, NBINS_Y) for a season and event, for
+        `team_id` or the whole league if team_id is None (the summed xG
+        instead if `xg` is True).
+        Returns None if the season, team or event is not in the cube, or if
+        `xg` is True and the shots have not been scored.
+        """
+        counts, league = (self.xg, self.league_xg) if xg else (self.counts, self.league)
+        if counts is None:
+            return None
+        try:
+            s = self.seasons.index(int(season))
+            e = self.events.index(event)
+            if team_id is None:
+                return league[s, e]
+            return counts[s, self.teams.index(int(team_id)), e]
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def bin_centers():
+        """Coordinates of the bin centers along x and y"""
+        step_x = (RANGE_X[1] - RANGE_X[0]) / NBINS_X
+        step_y = (RANGE_Y[1] - RANGE_Y[0]) / NBINS_Y
+        return (
+            RANGE_X[0] + step_x * (np.arange(NBINS_X) + 0.5),
+            RANGE_Y[0] + step_y * (np.arange(NBINS_Y) + 0.5),
+        )
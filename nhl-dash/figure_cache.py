@@ -0,0 +1,91 @@
+import functools
+import json
+import threading
+from collections import OrderedDict
+
+
+class FigureCache:
+    """
+    Least recently used cache of serialized figures (JSON strings) keyed on
+    callback arguments. The total size of the stored JSON is kept below
+    `max_bytes` by evicting the least recently used figures.
+    Arguments:
+    - max_bytes: memory bound for the stored figures (0 disables the cache)
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._figures = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Cached JSON for `key`, or None"""
+        with self._lock:
+            figure = self._figures.get(key)
+            if figure is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._figures.move_to_end(key)
+            return figure
+
+    def put(self, key, figure):
+        """Store the JSON string `figure`, evicting old entries if needed"""
+        size = len(figure)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._figures:
+                self._bytes -= len(self._figures.pop(key))
+            self._figures[key] = figure
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, old = self._figures.popitem(last=False)
+                self._bytes -= len(old)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Hit/miss statistics and current size"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._figures),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def memoize(self, func):
+        """
+        Decorator for callbacks returning a plotly figure (or None).
+        The figure is serialized once and later calls with the same
+        arguments return the decoded JSON without rebuilding the figure.
+        """
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            # Callback arguments can be lists (e.g. checklist values)
+            key = json.dumps([func.__name__, args], default=str)
+
+            figure = self.get(key)
+            if figure is None:
+                fig = func(*args)
+                if fig is None:
+                    return None
+                figure = fig.to_json()
+                self.put(key, figure)
+            return json.loads(figure)
+
+        return wrapper
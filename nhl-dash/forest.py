@@ -0,0 +1,283 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from asset_store import MappedTable, write_table
+
+# Rows scored per pass of ForestModel.predict_proba: the nodes reached by
+# every (row, tree) pair are held in a (rows, trees) array
+BATCH_ROWS = 20_000
+
+# Storage of the split thresholds and leaf probabilities:
+# - "float64": same values as scikit-learn
+# - "float32": half the size. Thresholds are rounded down to the nearest
+#   float32, which makes `x <= threshold` exact for the float32 features the
+#   trees are evaluated on, so every shot reaches the same leaves. Only the
+#   leaf probabilities are rounded (to ~1e-7)
+PRECISIONS = ["float64", "float32"]
+
+
+def preprocessing_steps(transformer):
+    """
+    Parameters of a fitted ColumnTransformer as JSON-serializable steps, in
+    the order of its output columns. Only StandardScaler and OneHotEncoder
+    (alone or as a one-step Pipeline) are supported, as in the modeling
+    scripts, anything else raises ValueError.
+    """
+    steps = []
+    for name, step, columns in transformer.transformers_:
+        if step == "drop" or len(columns) == 0:
+            continue
+        if hasattr(step, "steps"):
+            if len(step.steps) != 1:
+                raise ValueError(f"{name}: only one-step pipelines are supported")
+            step = step.steps[0][1]
+        kind = type(step).__name__
+
+        if kind == "StandardScaler":
+            n = len(columns)
+            mean = step.mean_ if step.mean_ is not None else np.zeros(n)
+            scale = step.scale_ if step.scale_ is not None else np.ones(n)
+            steps.append(
+                {
+                    "kind": "scale",
+                    "columns": list(columns),
+                    "mean": mean.tolist(),
+                    "scale": scale.tolist(),
+                }
+            )
+        elif kind == "OneHotEncoder" and step.drop is None:
+            steps.append(
+                {
+                    "kind": "onehot",
+                    "columns": list(columns),
+                    "categories": [c.tolist() for c in step.categories_],
+                }
+            )
+        else:
+            raise ValueError(f"{name}: unsupported transformer {kind}")
+    return steps
+
+
+def export_forest(pipeline, directory, precision="float64"):
+    """
+    Save a fitted Pipeline(preprocess=ColumnTransformer, clf=RandomForest)
+    as flat node arrays with `write_table`: the nodes of all the trees one
+    after the other, the (left, right) children of every node as indices
+    global to the table, and every leaf pointing to itself (so a fixed
+    number of steps reaches the leaves from any depth). The preprocessing
+    parameters and the classes go in the manifest.
+    Arguments:
+    - pipeline: fitted scikit-learn pipeline (best_rf.sav)
+    - directory: output folder
+    - precision: one of PRECISIONS
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}")
+    preprocess, forest = pipeline.steps[0][1], pipeline.steps[-1][1]
+
+    columns = {"feature": [], "threshold": [], "children": [], "value": []}
+    offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count) + offset
+        leaf = tree.children_left < 0
+
+        threshold = tree.threshold
+        if precision == "float32":
+            rounded = threshold.astype(np.float32)
+            above = rounded.astype(np.float64) > threshold
+            rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+            threshold = rounded
+
+        value = tree.value[:, 0, :]
+        columns["feature"].append(np.where(leaf, 0, tree.feature))
+        columns["threshold"].append(np.where(leaf, 0, threshold))
+        left = np.where(leaf, nodes, tree.children_left + offset)
+        right = np.where(leaf, nodes, tree.children_right + offset)
+        columns["children"].append(np.stack([left, right], axis=1))
+        columns["value"].append(value / value.sum(axis=1, keepdims=True))
+        offset += tree.node_count
+
+    dtypes = {
+        "feature": np.int16,
+        "threshold": precision,
+        "children": np.int32,
+        "value": precision,
+    }
+    write_table(
+        directory,
+        {
+            name: np.concatenate(arrays).astype(dtypes[name])
+            for name, arrays in columns.items()
+        },
+        meta={
+            "features": [str(name) for name in preprocess.feature_names_in_],
+            "preprocessing": preprocessing_steps(preprocess),
+            "classes": [str(c) for c in forest.classes_],
+            "roots": np.cumsum(
+                [0] + [e.tree_.node_count for e in forest.estimators_[:-1]]
+            ).tolist(),
+            "max_depth": int(max(e.tree_.max_depth for e in forest.estimators_)),
+            "precision": precision,
+        },
+    )
+
+
+class ForestModel:
+    """
+    Random forest pipeline exported with `export_forest`, evaluated with
+    NumPy only (no scikit-learn import, node arrays memory mapped). Has the
+    `classes_`, `predict_proba` and `predict` of the original pipeline.
+    Arguments:
+    - directory: folder written by `export_forest`
+    """
+
+    def __init__(self, directory):
+        table = MappedTable(directory)
+        self.directory = directory
+        self.meta = table.meta
+        self.classes_ = np.array(self.meta["classes"], dtype=object)
+        self.roots = np.array(self.meta["roots"], dtype=np.int32)
+        self.feature = table.column("feature")
+        self.threshold = table.column("threshold")
+        # flattened, the children of node i are at 2 * i (left), 2 * i + 1
+        self.children = table.column("children").reshape(-1)
+        self.value = table.column("value")
+
+    @property
+    def nbytes(self):
+        return sum(
+            a.nbytes for a in [self.feature, self.threshold, self.children, self.value]
+        )
+
+    def transform(self, df):
+        """
+        float32 matrix of the tree features of the dataframe `df`, with the
+        same arithmetic as the ColumnTransformer: scaling is done in the
+        common dtype of the input columns (float32 for the shot features),
+        with the mean and scale cast to it
+        """
+        features = []
+        for step in self.meta["preprocessing"]:
+            columns = step["columns"]
+            if step["kind"] == "scale":
+                dtype = np.result_type(*[df[c].dtype for c in columns])
+                if not np.issubdtype(dtype, np.floating):
+                    dtype = np.float64
+                x = df[columns].to_numpy(dtype=dtype)
+                x -= np.array(step["mean"], dtype=dtype)
+                x /= np.array(step["scale"], dtype=dtype)
+                features.append(x)
+            else:
+                # unknown categories are all zeros (handle_unknown="ignore")
+                for column, labels in zip(columns, step["categories"]):
+                    values = df[column].to_numpy()
+                    features.append(
+                        np.stack([values == label for label in labels], axis=1)
+                    )
+        return np.hstack(features).astype(np.float32)
+
+    def apply(self, X):
+        """Global leaf index reached by every row of X in every tree,
+        shape (rows, trees). Every step moves all the (row, tree) pairs one
+        level down at once (leaves loop on themselves)"""
+        rows = (np.arange(len(X), dtype=np.int32) * X.shape[1])[:, None]
+        flat = X.ravel()
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.meta["max_depth"]):
+            right = flat[rows + self.feature[node]] > self.threshold[node]
+            node = self.children[2 * node + right]
+        return node
+
+    def predict_proba(self, df):
+        """Class probabilities (columns in the order of `classes_`), the
+        average of the leaf probabilities of all the trees"""
+        X = self.transform(df)
+        proba = np.empty((len(X), len(self.classes_)))
+        for start in range(0, len(X), BATCH_ROWS):
+            leaves = self.apply(X[start : start + BATCH_ROWS])
+            proba[start : start + BATCH_ROWS] = self.value[leaves].mean(axis=1)
+        return proba
+
+    def predict(self, df):
+        return self.classes_[self.predict_proba(df).argmax(axis=1)]
+
+
+def compare(pipeline, forest, df):
+    """Differences between the scikit-learn pipeline and the exported forest
+    on the shots of `df`"""
+    proba = pipeline.predict_proba(df)
+    exported = forest.predict_proba(df)
+    return {
+        "shots": len(df),
+        "same_predictions": float(
+            np.mean(pipeline.classes_[proba.argmax(axis=1)] == forest.predict(df))
+        ),
+        "max_proba_difference": float(np.abs(proba - exported).max()),
+    }
+
+
+def timed(function, *args, repeat=1):
+    """Result of `function(*args)` and its best time over `repeat` calls"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+### Export best_rf.sav to NumPy arrays and check it against the pipeline
+# Usage: python forest.py ../SavedModels/best_rf.sav ../SavedModels/best_rf
+#          [--precision float32] [--check ../SavedData/model_df.parquet]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model", help="joblib file of the pipeline (best_rf.sav)")
+    parser.add_argument("directory", help="output folder")
+    parser.add_argument("--precision", choices=PRECISIONS, default="float64")
+    parser.add_argument("--check", help="Parquet file of shots (model_df.parquet)")
+    parser.add_argument("--rows", type=int, default=100_000, help="shots checked")
+    args = parser.parse_args()
+
+    import joblib
+
+    pipeline, load_pipeline = timed(joblib.load, args.model)
+    export_forest(pipeline, args.directory, args.precision)
+    forest, load_forest = timed(ForestModel, args.directory)
+    print(f"=== Exported {len(forest.feature)} nodes to {args.directory}")
+    print(f"{'':10}{'load (s)':>10}{'size (MB)':>11}{'1 shot (ms)':>13}")
+    for name, model, load, path in [
+        ("sklearn", pipeline, load_pipeline, args.model),
+        ("exported", forest, load_forest, args.directory),
+    ]:
+        size = (
+            sum(e.stat().st_size for e in os.scandir(path))
+            if os.path.isdir(path)
+            else os.path.getsize(path)
+        )
+        print(f"{name:10}{load:10.3f}{size / 1e6:11.1f}", end="")
+        if args.check:
+            import pandas as pd
+
+            shot = pd.read_parquet(args.check).drop(columns="event").iloc[:1]
+            _, seconds = timed(model.predict_proba, shot, repeat=20)
+            print(f"{seconds * 1e3:13.2f}", end="")
+        print()
+
+    if args.check:
+        import pandas as pd
+
+        # best_rf is refitted on all the shots, so besides a sample of them
+        # the check uses unseen shots: every column shuffled independently,
+        # with random coordinates over the rink
+        df = pd.read_parquet(args.check).drop(columns="event")
+        df = df.sample(min(args.rows, len(df)), random_state=0)
+        rng = np.random.default_rng(0)
+        unseen = pd.DataFrame({c: rng.permutation(df[c].to_numpy()) for c in df})
+        unseen["st_x"] = rng.uniform(-100, 100, len(df)).astype(np.float32)
+        unseen["st_y"] = rng.uniform(-45, 45, len(df)).astype(np.float32)
+        print(f"=== Sample: {compare(pipeline, forest, df)}")
+        print(f"=== Unseen: {compare(pipeline, forest, unseen)}")
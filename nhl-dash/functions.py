@@ -1,35 +1,46 @@
-import plotly.express as px
-import plotly.graph_objects as go
+import numpy as np
 
-import plotly.io as pio
+from CONSTANTS import SCATTER_CELL, SCATTER_MAX_POINTS, SCATTER_WEBGL_POINTS
+from data import get_data
+from density import NBINS_X, NBINS_Y
+
+# Plotly is imported inside the plotting functions so that it is only
+# loaded when the first figure is requested
 
-from CONSTANTS import *
 
-pio.templates.default = "simple_white"
 #####################################
 # Plotting functions
-def team_goals(team_id, df_pro=df_teams_season, df_con=df_teams_conceded):
+def team_goals(team_id, stats=None):
     """Create plotly figure with line plots of goals scored and conceded
-    for a given `team` across seasons"""
+    for a given `team` across seasons. The goals are read from the team
+    season aggregate (DashData.team_stats) unless `stats` is given"""
+    import plotly.graph_objects as go
+
+    data = get_data()
+    stats = data.team_stats if stats is None else stats
+    team = stats[stats["team_id"] == team_id]
 
     fig = go.Figure()
 
     fig.add_scatter(
-        x=df_pro[df_pro["team_id"] == team_id]["season"],
-        y=df_pro[df_pro["team_id"] == team_id]["number_of_goals"],
+        x=team["season"],
+        y=team["goals_for"],
         name="Scored",
         line=dict(color="#0f3e66"),
     )
 
     fig.add_scatter(
-        x=df_con[df_con["team_id"] == team_id]["season"],
-        y=df_con[df_con["team_id"] == team_id]["goals_conceded"],
+        x=team["season"],
+        y=team["goals_against"],
         name="Conceded",
         line=dict(color="#b53312"),
     )
 
     fig.update_layout(
-        title="Goals - " + team_dict[team_id], xaxis_title="Season", yaxis_title="Goals"
+        title="Goals - " + data.team_dict[team_id],
+        xaxis_title="Season",
+        yaxis_title="Goals",
+        template="simple_white",
     )
     fig.update_layout(hovermode="x unified")
     fig.update_xaxes(tickangle=45)
@@ -45,29 +56,62 @@ def team_goals(team_id, df_pro=df_teams_season, df_con=df_teams_conceded):
     return fig
 
 
-def plot_heatmap_from_df(season, team_id, event, df=shots_df):
+def plot_heatmap_from_df(season, team_id, event, density=None):
     """
-    DOCUMENT THIS!
+    Plots a heatmap of the positions of `event` for a team in a season, with
+    background rink. The counts are read from the precomputed ShotDensity
+    cube, so no shot is binned at request time.
+    Arguments:
+    - season: integer value of start year of season
+    - team_id: ID of team as given by the table team_info. If None, plots
+      the league-wide totals.
+    - event: one of 'Shot', 'Missed Shot', 'Goal'
+    - density: ShotDensity with the counts (default: the app's cube)
     """
-    df = df.query(f"season == '{season}' and team_id_for == '{team_id}'")
+    import plotly.graph_objects as go
 
-    fig = px.density_heatmap(
-        df.query(f"event == '{event}'"),
-        x="st_x",
-        y="st_y",
-        nbinsx=80,
-        nbinsy=40,
-        range_x=[-100, 100],
-        range_y=[-45, 45],
-        color_continuous_scale="Reds",
-        title=team_dict[team_id] + " " + str(season) + " " + event + "s",
+    data = get_data()
+    density = data.density if density is None else density
+
+    counts = density.grid(season, event, team_id)
+    if counts is None:
+        counts = np.zeros((NBINS_X, NBINS_Y), dtype=np.uint16)
+    # summed expected goals of every bin, when the shots have been scored
+    xg = density.grid(season, event, team_id, xg=True)
+    x, y = density.bin_centers()
+
+    if team_id is None:
+        name = "League"
+    else:
+        name = data.team_dict[team_id]
+
+    fig = go.Figure(
+        go.Heatmap(
+            x=x,
+            y=y,
+            z=counts.T,
+            colorscale="Reds",
+            colorbar=dict(title="count"),
+            customdata=None if xg is None else xg.T,
+            hovertemplate="st_x=%{x}<br>st_y=%{y}<br>count=%{z}"
+            + ("" if xg is None else "<br>xG=%{customdata:.2f}")
+            + "<extra></extra>",
+        )
+    )
+    title = name + " " + str(season) + " " + str(event) + "s"
+    if xg is not None:
+        title += f"<br><sup>{xg.sum():.1f} xG</sup>"
+    fig.update_layout(
+        title=title,
+        xaxis_range=[-100, 100],
+        yaxis_range=[-45, 45],
     )
 
     fig.update_traces(opacity=0.6)
 
     fig.add_layout_image(
         dict(
-            source="data:image/jpg;base64,{}".format(image1.decode()),
+            source=data.rink_source,
             xref="x",
             yref="y",
             x=-100,
@@ -102,48 +146,103 @@ def plot_heatmap_from_df(season, team_id, event, df=shots_df):
     return fig
 
 
-def plot_shot_type(season, team_id, shot_type, game_id=None, df=shots_df):
+def plot_shot_type(
+    season,
+    team_id,
+    shot_type,
+    game_id=None,
+    store=None,
+    view=None,
+    progress=None,
+    selection=None,
+):
     """
     Plots shot position with background rink (NHL official size).
     Arguments:
-    - con: conncetion to nhl database (given in project folder or converted from kaggle dataset)
     - season: integer value of start year of season (currently available: 2000 to 2019)
     - team_id: ID of team as given by the table team_info
     - shot_type: secondary event type of shot events.
         * Available: 'Wrist Shot', 'Slap Shot', 'Snap Shot', 'Backhand', 'Tip-In', 'Deflected', 'Wrap-around'.
     - game_id (optional): if None is given, plots the entire season. Otherwise, plots only shots for specific game_id.
+    - store: ShotStore or SqlShotStore with the shots data (default: the app's
+      shot source, see DashData.shot_source)
+    - view (optional): zoomed region (x0, x1, y0, y1). Only shots inside it are plotted.
+    - progress (optional): called as progress(step, steps) as the figure is built.
+    - selection (optional): handle of (season, team_id) from `store.selection`,
+      whose rows are filtered instead of looking the partition up again.
+    Season-wide plots are drawn with WebGL, and when more than SCATTER_MAX_POINTS
+    shots are in view they are aggregated on a grid (see `aggregate_shots`).
+    When the shots have been scored (score_xg.py), markers are sized by their
+    expected goals and the title shows the total xG of the selection.
     """
+    import plotly.express as px
 
-    df = df.query(f"season == '{season}' and team_id_for == '{team_id}'")
+    def report(step):
+        if progress is not None:
+            progress(step, 3)
+
+    data = get_data()
+    store = data.shot_source if store is None else store
+    if selection is None:
+        selection = store.selection(team_id, season)
+    report(0)
 
     if game_id:
-        df = df.query(f"secondaryType == '{shot_type}' and game_id == {game_id}")
+        df = store.select_in(selection, secondaryType=shot_type, game_id=game_id)
+        summary = shots_summary(df)
         title = (
-            team_dict[team_id]
+            data.team_dict[team_id]
             + " "
             + str(season)
             + " Game ID: "
             + str(game_id)
             + " "
             + shot_type
-            + f"s <br><sup>{len(df)} shots</sup>"
+            + f"s <br><sup>{summary}</sup>"
         )
 
     else:
-        df = df.query(f"secondaryType == '{shot_type}'")
+        df = store.select_in(selection, secondaryType=shot_type)
+        summary = shots_summary(df)
         title = (
-            team_dict[team_id]
+            data.team_dict[team_id]
             + " "
             + str(season)
             + " "
             + shot_type
-            + f"s <br><sup>{len(df)} shots</sup>"
+            + f"s <br><sup>{summary}</sup>"
         )
 
+    range_x = [-100, 100]
+    range_y = [-45, 45]
+    if view is not None:
+        range_x = sorted(view[:2])
+        range_y = sorted(view[2:])
+        df = df[df["st_x"].between(*range_x) & df["st_y"].between(*range_y)]
+
     number_of_shots = len(df)
+    report(1)
 
     marker_size = 10
     marker_width = 1
+    has_xg = has_scores(df)
+
+    # Level of detail: aggregate when there are too many shots in view
+    aggregated = number_of_shots > SCATTER_MAX_POINTS
+    if aggregated:
+        df = aggregate_shots(df)
+        title += (
+            f"<br><sup>grouped in {SCATTER_CELL} ft cells, zoom in for detail</sup>"
+        )
+
+    report(2)
+
+    if aggregated:
+        size = "shots"
+        hover_data = ["shots", "xg"] if has_xg else ["shots"]
+    else:
+        size = "xg" if has_xg else None
+        hover_data = ["xg"] if has_xg else None
 
     fig = px.scatter(
         df,
@@ -151,9 +250,12 @@ def plot_shot_type(season, team_id, shot_type, game_id=None, df=shots_df):
         y="st_y",
         color="event",
         symbol="event",
-        range_x=[-100, 100],
-        range_y=[-45, 45],
+        size=size,
+        hover_data=hover_data,
+        range_x=range_x,
+        range_y=range_y,
         title=title,
+        render_mode="webgl" if number_of_shots > SCATTER_WEBGL_POINTS else "svg",
         # color_discrete_map={  # replaces default color mapping by value
         #     "Goal": "DarkRed",
         #     "Shot": "LawnGreen",
@@ -164,17 +266,20 @@ def plot_shot_type(season, team_id, shot_type, game_id=None, df=shots_df):
         },
     )
 
-    fig.update_traces(
-        marker=dict(
+    if size is not None:
+        marker = dict(line=dict(width=marker_width, color="DarkSlateGrey"))
+    else:
+        marker = dict(
             size=marker_size, line=dict(width=marker_width, color="DarkSlateGrey")
-        ),
-        selector=dict(mode="markers"),
-        opacity=0.6,
-    )
+        )
+    fig.update_traces(marker=marker, selector=dict(mode="markers"), opacity=0.6)
+
+    # Keep the user's zoom while the figure is re-rendered for the same selection
+    fig.update_layout(uirevision=f"{season}-{team_id}-{shot_type}-{game_id}")
 
     fig.add_layout_image(
         dict(
-            source="data:image/jpg;base64,{}".format(image1.decode()),
+            source=data.rink_source,
             xref="x",
             yref="y",
             x=-100,
@@ -203,5 +308,53 @@ def plot_shot_type(season, team_id, shot_type, game_id=None, df=shots_df):
             "paper_bgcolor": "rgba(0, 0, 0, 0)",
         }
     )
+    report(3)
 
     return fig
+
+
+def has_scores(df):
+    """True if every shot of `df` has its expected goals (see score_xg.py)"""
+    return "xg" in df.columns and not df["xg"].isna().any()
+
+
+def shots_summary(df):
+    """Number of shots of `df`, and their total xG when they are scored"""
+    if has_scores(df):
+        return f"{len(df)} shots, {df['xg'].sum():.1f} xG"
+    return f"{len(df)} shots"
+
+
+def aggregate_shots(df, cell=SCATTER_CELL):
+    """
+    Group shots by event on a grid of `cell` x `cell` ft cells.
+    Returns a dataframe with one row per non-empty cell: event, st_x and st_y
+    (cell center), the number of `shots` in the cell and their summed `xg`
+    when the shots are scored.
+    """
+    cells = df.assign(
+        st_x=(np.floor(df["st_x"] / cell) + 0.5) * cell,
+        st_y=(np.floor(df["st_y"] / cell) + 0.5) * cell,
+    )
+    groups = cells.groupby(["event", "st_x", "st_y"], observed=True)
+    if has_scores(df):
+        return groups.agg(shots=("xg", "size"), xg=("xg", "sum")).reset_index()
+    return groups.size().reset_index(name="shots")
+
+
+def view_from_relayout(relayout):
+    """
+    Zoomed region (x0, x1, y0, y1) from a graph's `relayoutData`, or None
+    when the graph is not zoomed on both axes.
+    """
+    if not relayout:
+        return None
+    try:
+        return (
+            relayout["xaxis.range[0]"],
+            relayout["xaxis.range[1]"],
+            relayout["yaxis.range[0]"],
+            relayout["yaxis.range[1]"],
+        )
+    except KeyError:
+        return None
@@ -0,0 +1,129 @@
+import numpy as np
+
+
+class GameIndex:
+    """
+    Game dimension of the dashboard: the columns of `df_games` sorted by
+    `game_id`, so that games are found by binary search (`searchsorted`)
+    instead of a `df_games.query` per game.
+    Arguments:
+    - df_games: dataframe with one row per game (game_id, home_team_id,
+      away_team_id, venue, season, date)
+    """
+
+    def __init__(self, df_games):
+        ids = df_games["game_id"].to_numpy(dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        self.game_id = ids[order]
+        self.columns = {
+            name: df_games[name].to_numpy()[order]
+            for name in df_games.columns
+            if name != "game_id"
+        }
+
+    def __len__(self):
+        return len(self.game_id)
+
+    def positions(self, game_ids):
+        """Positions of `game_ids` in the index (-1 for unknown games)"""
+        game_ids = np.asarray(game_ids, dtype=np.int64)
+        if not len(self):
+            return np.full(len(game_ids), -1)
+        pos = np.searchsorted(self.game_id, game_ids)
+        pos = np.minimum(pos, len(self) - 1)
+        return np.where(self.game_id[pos] == game_ids, pos, -1)
+
+    def lookup(self, game_ids, column):
+        """Values of `column` for an array of game ids (None for unknown games)"""
+        pos = self.positions(game_ids)
+        values = self.columns[column][pos].astype(object)
+        values[pos < 0] = None
+        return values
+
+    def get(self, game_id, column):
+        """Value of `column` for a single game (None if unknown)"""
+        try:
+            return self.lookup([int(game_id)], column)[0]
+        except (TypeError, ValueError):
+            return None
+
+
+class GameSummary:
+    """
+    Per-game summary table aligned with a GameIndex: home/away team ids,
+    venue and date from `df_games`, plus the goals and shots on goal
+    ('Shot' and 'Goal' events) of each side counted from the shot store.
+    Arguments:
+    - games: GameIndex
+    - shots: ShotStore with the shots data, or ShotCounts of (game_id,
+      team_id_for, event) in SQL mode (see sql_store.py)
+    """
+
+    def __init__(self, games, shots):
+        self.games = games
+
+        pos = games.positions(shots.columns["game_id"])
+        known = pos >= 0
+        pos = pos[known]
+        count = shots.columns.get("count")
+        weights = None if count is None else count[known]
+        home = shots.columns["team_id_for"][known] == games.columns["home_team_id"][pos]
+        event = shots.columns["event"][known]
+        goal = event == shots.encode("event", "Goal")
+        on_goal = goal | (event == shots.encode("event", "Shot"))
+
+        def count(rows):
+            return np.bincount(
+                pos[rows],
+                weights=None if weights is None else weights[rows],
+                minlength=len(games),
+            ).astype(np.int32)
+
+        self.columns = {
+            "home_goals": count(goal & home),
+            "away_goals": count(goal & ~home),
+            "home_shots": count(on_goal & home),
+            "away_shots": count(on_goal & ~home),
+        }
+
+    def get(self, game_id):
+        """Summary of a game as a dictionary, or None if unknown"""
+        try:
+            pos = self.games.positions([int(game_id)])[0]
+        except (TypeError, ValueError):
+            return None
+        if pos < 0:
+            return None
+
+        summary = {"game_id": int(game_id)}
+        for name, col in {**self.games.columns, **self.columns}.items():
+            value = col[pos]
+            summary[name] = value.item() if hasattr(value, "item") else value
+        return summary
+
+    def for_team(self, game_id, team_id):
+        """
+        Summary of a game from the point of view of `team_id`: team_against,
+        goals_for, goals_against, shots_for, shots_against, venue and date.
+        Returns None if the game is unknown or the team did not play it.
+        """
+        summary = self.get(game_id)
+        if summary is None:
+            return None
+
+        if summary["home_team_id"] == team_id:
+            side, other = "home", "away"
+        elif summary["away_team_id"] == team_id:
+            side, other = "away", "home"
+        else:
+            return None
+
+        return {
+            "team_against": summary[f"{other}_team_id"],
+            "goals_for": summary[f"{side}_goals"],
+            "goals_against": summary[f"{other}_goals"],
+            "shots_for": summary[f"{side}_shots"],
+            "shots_against": summary[f"{other}_shots"],
+            "venue": summary["venue"],
+            "date": summary["date"],
+        }
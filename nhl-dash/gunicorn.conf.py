@@ -0,0 +1,12 @@
+import os
+
+from CONSTANTS import PRELOAD
+
+# Production server settings, used as: gunicorn -c gunicorn.conf.py wsgi:server
+# The data is loaded once by the master and shared with the workers (see wsgi.py)
+
+bind = os.environ.get("NHL_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("NHL_WORKERS", 4))
+threads = int(os.environ.get("NHL_THREADS", 1))
+preload_app = PRELOAD
+timeout = 120
@@ -1,140 +1,207 @@
 # Bruno Vieira Ribeiro June, 2022
 
-from matplotlib.pyplot import figure
-from dash import Dash, html, dcc
+from dash import Dash, ctx, html, dcc, no_update
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
-import numpy as np
-import pickle
-import base64
 
-import plotly.io as pio
-
-pio.templates.default = "simple_white"
-
-from CONSTANTS import *
-from functions import *
+from CONSTANTS import (
+    ASSETS_MAX_AGE,
+    BACKGROUND,
+    BG_STYLE,
+    CLIENTSIDE,
+    FIGURE_CACHE_MB,
+)
+from data import get_data
+from figure_cache import FigureCache
+from functions import (
+    plot_heatmap_from_df,
+    plot_shot_type,
+    team_goals,
+    view_from_relayout,
+)
 
 ######################## Start of app
 # app = Dash(__name__)
 app = Dash(__name__, external_stylesheets=[dbc.themes.UNITED])
 
-app.layout = html.Div(
-    [
-        html.H1(children="NHL - Game Explorer", style={"font-family": "Fantasy"}),
-        dbc.Row(
-            [
-                dbc.Col(
-                    [
-                        html.H4("Select team:", style={"font-family": "Fantasy"}),
-                        dcc.Dropdown(
-                            id="team-choice",
-                            options=team_options,
-                            style={"color": "#000000"},
-                            value=20,
-                            placeholder="Select team...",
-                            clearable=False,
-                        ),
-                    ],
-                    width=3,
-                ),
-                dbc.Col(
-                    [
-                        html.H4("Select Season:", style={"font-family": "Fantasy"}),
-                        dcc.Dropdown(
-                            id="season-choice",
-                            style={"color": "#000000"},
-                            placeholder="Select season...",
-                        ),
-                    ],
-                    width=3,
-                ),
-                dbc.Col(
-                    [
-                        html.H4("Select Event Type:", style={"font-family": "Fantasy"}),
-                        dcc.Dropdown(
-                            id="type-choice",
-                            options=type_options,
-                            style={"color": "#000000"},
-                            value="Wrist Shot",
-                            placeholder="Select type of event...",
-                            clearable=False,
-                        ),
-                    ],
-                    width=3,
-                ),
-            ]
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    [
-                        html.H6("Select Game Date:", style={"font-family": "Fantasy"}),
-                        dcc.Dropdown(
-                            id="game-choice",
-                            style={"color": "#000000"},
-                            placeholder="Select game...",
-                            clearable=False,
-                        ),
-                    ],
-                ),
-            ]
-        ),
-        dbc.Row(
-            [
-                dbc.Col(html.Div(id="team-for"), width=2),
-                dbc.Col(
-                    [
-                        html.Center(id="score-board"),
-                        dcc.Graph(id="scatter-types"),
-                    ],
-                    width={"size": 8},
-                ),
-                dbc.Col(html.Div(id="team-against"), width=2),
-            ],
-            justify="center",
-            align="center",
-            className="h-50",
-        ),
-        ############## Start of two columns for bottom charts
-        dbc.Row(
-            [
-                dbc.Col(
-                    [
-                        html.H4("Select Event:", style={"font-family": "Fantasy"}),
-                        dcc.Dropdown(
-                            id="event-choice",
-                            options=event_options,
-                            style={"color": "#000000"},
-                            value="Shot",
-                            placeholder="Select event...",
-                            clearable=False,
-                        ),
-                        dcc.Graph(
-                            id="heatmap-events",
-                        ),
-                    ],
-                    width=6,
-                ),
-                dbc.Col(
-                    dcc.Graph(id="goals-evo"),
-                    width=6,
-                ),
-            ]
-        ),
-    ],
-    style=BG_STYLE,
-)
+# WSGI callable for production servers (see wsgi.py and gunicorn.conf.py)
+server = app.server
+
+# Let browsers cache the static assets (rink image, logos...)
+app.server.config["SEND_FILE_MAX_AGE_DEFAULT"] = ASSETS_MAX_AGE
+
+# Figures only depend on the callback arguments, so they are cached per worker
+figure_cache = FigureCache(int(FIGURE_CACHE_MB * 1e6))
+
+
+@app.server.route("/_figure-cache")
+def figure_cache_stats():
+    return figure_cache.stats()
+
+
+# The layout is served by a function so that the data (needed for the
+# dropdown options) is loaded on the first request instead of at import
+def serve_layout():
+    data = get_data()
+    return html.Div(
+        [
+            html.H1(children="NHL - Game Explorer", style={"font-family": "Fantasy"}),
+            # Current (team, season) selection, see update_selection
+            dcc.Store(id="selection"),
+            # Clientside mode data, see clientside.py
+            dcc.Store(id="team-bundle"),
+            dcc.Store(id="league-request"),
+            dcc.Store(id="league-grid"),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            html.H4("Select team:", style={"font-family": "Fantasy"}),
+                            dcc.Dropdown(
+                                id="team-choice",
+                                options=data.team_options,
+                                style={"color": "#000000"},
+                                value=20,
+                                placeholder="Select team...",
+                                clearable=False,
+                            ),
+                        ],
+                        width=3,
+                    ),
+                    dbc.Col(
+                        [
+                            html.H4("Select Season:", style={"font-family": "Fantasy"}),
+                            dcc.Dropdown(
+                                id="season-choice",
+                                style={"color": "#000000"},
+                                placeholder="Select season...",
+                            ),
+                        ],
+                        width=3,
+                    ),
+                    dbc.Col(
+                        [
+                            html.H4(
+                                "Select Event Type:", style={"font-family": "Fantasy"}
+                            ),
+                            dcc.Dropdown(
+                                id="type-choice",
+                                options=data.type_options,
+                                style={"color": "#000000"},
+                                value="Wrist Shot",
+                                placeholder="Select type of event...",
+                                clearable=False,
+                            ),
+                        ],
+                        width=3,
+                    ),
+                ]
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            html.H6(
+                                "Select Game Date:", style={"font-family": "Fantasy"}
+                            ),
+                            dcc.Dropdown(
+                                id="game-choice",
+                                style={"color": "#000000"},
+                                placeholder="Select game...",
+                                clearable=False,
+                            ),
+                        ],
+                    ),
+                ]
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(html.Div(id="team-for"), width=2),
+                    dbc.Col(
+                        [
+                            html.Center(id="score-board"),
+                            # Shown while the scatter is built in background mode
+                            dbc.Progress(
+                                id="scatter-progress",
+                                striped=True,
+                                animated=True,
+                                style={"visibility": "hidden"},
+                            ),
+                            dcc.Graph(id="scatter-types"),
+                        ],
+                        width={"size": 8},
+                    ),
+                    dbc.Col(html.Div(id="team-against"), width=2),
+                ],
+                justify="center",
+                align="center",
+                className="h-50",
+            ),
+            ############## Start of two columns for bottom charts
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            html.H4("Select Event:", style={"font-family": "Fantasy"}),
+                            dcc.Dropdown(
+                                id="event-choice",
+                                options=data.event_options,
+                                style={"color": "#000000"},
+                                value="Shot",
+                                placeholder="Select event...",
+                                clearable=False,
+                            ),
+                            dcc.Checklist(
+                                id="heatmap-league",
+                                options=[{"label": " League-wide", "value": "league"}],
+                                value=[],
+                            ),
+                            dcc.Graph(
+                                id="heatmap-events",
+                            ),
+                        ],
+                        width=6,
+                    ),
+                    dbc.Col(
+                        dcc.Graph(id="goals-evo"),
+                        width=6,
+                    ),
+                ]
+            ),
+        ],
+        style=BG_STYLE,
+    )
+
+
+app.layout = serve_layout
 ######################## End of app
 
 ############################################################# CALLBACKS
+def server_only(*args, **kwargs):
+    """`app.callback` for the callbacks done in the browser in clientside mode"""
+    if CLIENTSIDE:
+        return lambda func: func
+    return app.callback(*args, **kwargs)
+
+
+def foreground(*args, **kwargs):
+    """`server_only` for the callbacks run as background jobs in background mode"""
+    if BACKGROUND:
+        return lambda func: func
+    return server_only(*args, **kwargs)
+
+
+if CLIENTSIDE:
+    import clientside
+
+    clientside.register(app)
+
+
 @app.callback(
     Output("goals-evo", "figure"),
     Input("team-choice", "value"),
 )
+@figure_cache.memoize
 def get_goals_graph(team_id):
     if not team_id:
         return None
@@ -143,29 +210,89 @@ def get_goals_graph(team_id):
 
 
 ##############################
-@app.callback(
+scatter_dependencies = [
     Output("scatter-types", "figure"),
-    Input("season-choice", "value"),
-    Input("team-choice", "value"),
+    Input("selection", "data"),
     Input("type-choice", "value"),
     Input("game-choice", "value"),
-)
-def get_scatter_graph(season, team_id, type, game):
+    Input("scatter-types", "relayoutData"),
+]
+
+
+@foreground(*scatter_dependencies, prevent_initial_call=True)
+def get_scatter_graph(selection, type, game, relayout):
+    # Zoom/pan: re-render the visible region (full detail when few enough shots)
+    view = None
+    if ctx.triggered_id == "scatter-types":
+        view = view_from_relayout(relayout)
+    return scatter_figure(selection, type, game, view)
+
+
+# Background mode: the scatter is built in a job process, with a progress bar.
+# A running job is cancelled when the team or season changes again (a new
+# type, game or zoom re-triggers the callback, which replaces the job).
+# Results are cached on disk by the manager instead of the figure cache.
+if BACKGROUND and not CLIENTSIDE:
+    from background import background_manager
+
+    @app.callback(
+        *scatter_dependencies,
+        prevent_initial_call=True,
+        background=True,
+        manager=background_manager(),
+        progress=[
+            Output("scatter-progress", "value"),
+            Output("scatter-progress", "max"),
+        ],
+        running=[
+            (
+                Output("scatter-progress", "style"),
+                {"visibility": "visible"},
+                {"visibility": "hidden"},
+            ),
+        ],
+        cancel=[Input("team-choice", "value"), Input("season-choice", "value")],
+    )
+    def get_scatter_graph_background(set_progress, selection, type, game, relayout):
+        view = None
+        if ctx.triggered_id == "scatter-types":
+            view = view_from_relayout(relayout)
+        return plot_shot_type(
+            selection["season"],
+            selection["team_id"],
+            type,
+            None if game == "all" else game,
+            view=view,
+            progress=lambda step, steps: set_progress((step, steps)),
+            selection=selection,
+        )
+
+
+@figure_cache.memoize
+def scatter_figure(selection, type, game, view):
+    season, team_id = selection["season"], selection["team_id"]
     if game == "all":
-        return plot_shot_type(season, team_id, type)
+        return plot_shot_type(season, team_id, type, view=view, selection=selection)
     else:
-        return plot_shot_type(season, team_id, type, game)
+        return plot_shot_type(
+            season, team_id, type, game, view=view, selection=selection
+        )
 
 
 ##############################
-@app.callback(
+@server_only(
     Output("heatmap-events", "figure"),
-    Input("team-choice", "value"),
-    Input("season-choice", "value"),
+    Input("selection", "data"),
     Input("event-choice", "value"),
+    Input("heatmap-league", "value"),
+    prevent_initial_call=True,
 )
-def get_heatmap_graph(team_id, season, event):
-    return plot_heatmap_from_df(season, team_id, event)
+@figure_cache.memoize
+def get_heatmap_graph(selection, event, league):
+    if league:
+        return plot_heatmap_from_df(selection["season"], None, event)
+    else:
+        return plot_heatmap_from_df(selection["season"], selection["team_id"], event)
 
 
 # DO UPDATE DROPDOWN
@@ -176,38 +303,56 @@ def get_heatmap_graph(team_id, season, event):
 # - Select event and type (these are independent)
 
 ##############################
-@app.callback(Output("season-choice", "options"), Input("team-choice", "value"))
-def update_season_dropdown(team):
+@app.callback(
+    Output("season-choice", "options"),
+    Output("season-choice", "value"),
+    Input("team-choice", "value"),
+    State("season-choice", "value"),
+)
+def update_season_dropdown(team, season):
     # Dropdown options for seasons
-    season_options = []
-    for s in np.sort(shots_df[shots_df["team_id_for"] == str(team)]["season"].unique()):
-        my_dict = {}
-        my_dict["label"] = s
-        my_dict["value"] = s
-        season_options.append(my_dict)
+    season_options = get_data().options.seasons(team)
 
-    return season_options
+    # Keep the selected season when the new team also played it, so that
+    # the selection below is only updated once
+    if season is None or season in [s["value"] for s in season_options]:
+        return season_options, no_update
+    return season_options, None
 
 
 ##############################
-@app.callback(
-    Output("game-choice", "options"),
+# Every callback depending on the (team, season) choice reads this handle
+# instead of the two dropdowns: a selection change is resolved once (with
+# the row range of its partition, which the scatter filters directly), and
+# unchanged selections do not trigger the graphs again
+@server_only(
+    Output("selection", "data"),
     Input("team-choice", "value"),
     Input("season-choice", "value"),
+    State("selection", "data"),
+)
+def update_selection(team, season, current):
+    selection = get_data().shot_source.selection(team, season)
+    if selection == current:
+        return no_update
+    return selection
+
+
+##############################
+@server_only(
+    Output("game-choice", "options"),
+    Output("game-choice", "value"),
+    Input("selection", "data"),
+    State("game-choice", "value"),
+    prevent_initial_call=True,
 )
-def update_game_dropdown(team, season):
-    game_options = []
-    game_options.append({"label": "all", "value": "all"})
-    for e in shots_df[
-        (shots_df["team_id_for"] == str(team)) & (shots_df["season"] == str(season))
-    ]["game_id"].unique():
-        my_dict = {}
-        my_dict["label"] = df_games.query(f"game_id == {e}")["date"].values[0]
-        my_dict["value"] = e
-        game_options.append(my_dict)
+def update_game_dropdown(selection, game):
+    game_options = get_data().options.games(selection["team_id"], selection["season"])
 
-    game_options = sorted(game_options, key=lambda k: k["label"])
-    return game_options
+    # Only reset the game when it is not part of the new selection
+    if game is None or game in [g["value"] for g in game_options]:
+        return game_options, no_update
+    return game_options, "all"
 
 
 ##############################
@@ -216,6 +361,7 @@ def update_game_dropdown(team, season):
     Input("team-choice", "value"),
 )
 def get_team_card(team):
+    team_dict = get_data().team_dict
     card = dbc.Card(
         [
             dbc.CardImg(
@@ -230,74 +376,59 @@ def get_team_card(team):
 
 
 ##############################
-@app.callback(
+@server_only(
     Output("team-against", "children"),
-    Input("team-choice", "value"),
+    Input("selection", "data"),
     Input("game-choice", "value"),
+    prevent_initial_call=True,
 )
-def get_team_against_card(team, game):
+def get_team_against_card(selection, game):
     if (game == "all") or game == None:
         return None
     else:
-        try:
-            team_against = shots_df.query(
-                f"game_id == {game} and team_id_for == '{team}'"
-            )["team_id_against"].values[0]
-
-            card = dbc.Card(
-                [
-                    dbc.CardImg(
-                        src=f"assets/logos-Transparent/{team_against}.png",
-                        top=True,
-                    ),
-                    dbc.CardBody(html.H4(team_dict[int(team_against)])),
-                ],
-                style={"background-color": "rgba(0,0,0,0)", "border": "none"},
-            )
-            return card
-        except IndexError:
+        data = get_data()
+        summary = data.summary.for_team(game, selection["team_id"])
+        if summary is None:
             return None
 
+        team_against = summary["team_against"]
+        card = dbc.Card(
+            [
+                dbc.CardImg(
+                    src=f"assets/logos-Transparent/{team_against}.png",
+                    top=True,
+                ),
+                dbc.CardBody(html.H4(data.team_dict[team_against])),
+            ],
+            style={"background-color": "rgba(0,0,0,0)", "border": "none"},
+        )
+        return card
+
 
 ##############################
-@app.callback(
+@server_only(
     Output("score-board", "children"),
     Input("game-choice", "value"),
-    Input("team-choice", "value"),
+    Input("selection", "data"),
+    prevent_initial_call=True,
 )
-def get_score(game, team):
+def get_score(game, selection):
     if (game == "all") or game == None:
         return None
     else:
-        try:
-            goals_for = shots_df.query(
-                f"game_id == {game} and team_id_for == '{team}'"
-            )["event"].value_counts()["Goal"]
-        except KeyError:
-            goals_for = 0
-        except IndexError:
-            goals_for = "-"
-
-        try:
-            team_against = shots_df.query(
-                f"game_id == {game} and team_id_for == '{team}'"
-            )["team_id_against"].values[0]
-        except IndexError:
-            team_against = "-"
-
-        try:
-            goals_against = shots_df.query(
-                f"game_id == {game} and team_id_for == '{team_against}'"
-            )["event"].value_counts()["Goal"]
-        except KeyError:
-            goals_against = 0
+        summary = get_data().summary.for_team(game, selection["team_id"])
+        if summary is None:
+            return None
 
         return [
-            html.H2(f"{goals_for} x {goals_against}"),
-            html.H4(df_games.query(f"game_id == {game}")["venue"].values[0]),
+            html.H2(f"{summary['goals_for']} x {summary['goals_against']}"),
+            html.H6(f"Shots: {summary['shots_for']} x {summary['shots_against']}"),
+            html.H4(summary["venue"]),
         ]
 
 
-### Run Main program
+### Run Main program (development server)
+# Usage: python nhl-dash-app-modular.py
+# In production: gunicorn -c gunicorn.conf.py wsgi:server
 if __name__ == "__main__":
-    app.run_server(debug=True)
+    app.run(debug=True)
@@ -521,4 +521,4 @@ def get_score(game, team):
 
 ### Run Main program
 if __name__ == "__main__":
-    app.run_server(debug=True)
+    app.run(debug=True)
@@ -0,0 +1,51 @@
+import numpy as np
+
+# Game dropdown entry for the whole season
+ALL_GAMES = {"label": "all", "value": "all"}
+
+
+class OptionsCatalogue:
+    """
+    Precomputed dropdown options (in the list of dictionaries format used
+    by `dcc.Dropdown`) for the season and game choices.
+    Built in a single pass over the shot store, whose rows are sorted by
+    (team_id_for, season, game_id).
+    Arguments:
+    - shots: ShotStore with the shots data, or ShotCounts of (team_id_for,
+      season, game_id) in SQL mode (see sql_store.py)
+    - games: GameIndex used for the game dates
+    """
+
+    def __init__(self, shots, games):
+        team = shots.columns["team_id_for"]
+        season = shots.columns["season"]
+        game = shots.columns["game_id"]
+
+        # First row of every distinct (team, season, game)
+        first = np.r_[
+            True,
+            (np.diff(team) != 0) | (np.diff(season) != 0) | (np.diff(game) != 0),
+        ]
+        team, season, game = team[first], season[first], game[first]
+        dates = games.lookup(game, "date")
+
+        self._games = {}
+        for t, s, g, date in zip(team.tolist(), season.tolist(), game.tolist(), dates):
+            self._games.setdefault((t, s), []).append({"label": date, "value": g})
+        for key, options in self._games.items():
+            # Sorted by label as before, so "all" comes after the dates
+            self._games[key] = sorted(
+                options + [ALL_GAMES], key=lambda k: str(k["label"])
+            )
+
+        self._seasons = {}
+        for t, s in sorted(self._games):
+            self._seasons.setdefault(t, []).append({"label": str(s), "value": s})
+
+    def seasons(self, team_id):
+        """Season options for a team"""
+        return self._seasons.get(team_id, [])
+
+    def games(self, team_id, season):
+        """Game options (date labels, game_id values) for a team and season"""
+        return self._games.get((team_id, season), [ALL_GAMES])
@@ -0,0 +1,75 @@
+import argparse
+import os
+
+import numpy as np
+
+from CONSTANTS import ASSETS, XG_MODEL
+
+# Shots per task of the parallel scoring
+CHUNK_ROWS = 200_000
+
+
+def score_shots(shots, model=XG_MODEL, full=False, n_jobs=-1, chunk_rows=CHUNK_ROWS):
+    """
+    Fill the `xg` column of the ShotStore `shots` with the expected goals of
+    every shot. Only the shots without a score (NaN, e.g. those of the games
+    added by an incremental build) are scored, unless `full` is True.
+    Chunks of `chunk_rows` shots are scored in parallel by `n_jobs` worker
+    processes, each loading the model once.
+    Returns the number of shots scored.
+    Arguments:
+    - shots: ShotStore with the model features (built with build_assets.py)
+    - model: best_rf.sav or a folder exported with forest.py (faster to load)
+    """
+    from joblib import Parallel, delayed
+
+    from xg import FEATURES, predict_with
+
+    missing = [name for name in FEATURES if name not in shots.columns]
+    if missing:
+        raise KeyError(
+            f"the shots have no {', '.join(missing)} column, "
+            "build them from the database with build_assets.py"
+        )
+
+    if "xg" in shots.columns and not full:
+        # writable copy of the memory-mapped column
+        xg = np.array(shots.columns["xg"])
+    else:
+        xg = np.full(len(shots), np.nan, dtype=np.float32)
+    rows = np.flatnonzero(np.isnan(xg))
+
+    scores = Parallel(n_jobs=n_jobs, max_nbytes="1M", mmap_mode="r")(
+        delayed(predict_with)(
+            model, {name: shots.columns[name][chunk] for name in FEATURES}
+        )
+        for chunk in np.array_split(rows, max(1, -(-len(rows) // chunk_rows)))
+        if len(chunk)
+    )
+    if scores:
+        xg[rows] = np.concatenate(scores)
+    shots.columns["xg"] = xg
+    return len(rows)
+
+
+### Score the shots of the dashboard assets with the xG model
+# Usage: python score_xg.py [--assets assets] [--model ../SavedModels/best_rf.sav]
+#          [--full] [--jobs N]
+if __name__ == "__main__":
+    from density import ShotDensity
+    from shot_store import ShotStore
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets", default=ASSETS)
+    parser.add_argument("--model", default=XG_MODEL)
+    parser.add_argument("--full", action="store_true", help="score all the shots again")
+    parser.add_argument("--jobs", type=int, default=int(os.environ.get("NHL_JOBS", -1)))
+    args = parser.parse_args()
+
+    shots = ShotStore.load(os.path.join(args.assets, "shots"))
+    scored = score_shots(shots, args.model, args.full, args.jobs)
+    print(f"=== Scored {scored} of {len(shots)} shots with {args.model}")
+    if scored:
+        shots.save(os.path.join(args.assets, "shots"))
+        ShotDensity.from_store(shots).save(os.path.join(args.assets, "shot_density"))
+        print("=== Computed shot_density")
@@ -0,0 +1,297 @@
+import sys
+
+import numpy as np
+
+from asset_store import MappedTable, write_table
+
+# Integer and float columns of the shot store with their compact dtypes
+SHOT_DTYPES = {
+    "season": np.int16,
+    "game_id": np.int32,
+    "team_id_for": np.int16,
+    "team_id_against": np.int16,
+    "st_x": np.float32,
+    "st_y": np.float32,
+}
+
+# Optional columns, kept when the source has them: the remaining features of
+# the xG model (stores built from the database with build_assets.py) and
+# the precomputed expected goals of every shot (score_xg.py, NaN until scored)
+SHOT_EXTRA_DTYPES = {
+    "period": np.int8,
+    "periodTime": np.int16,
+    "xg": np.float32,
+}
+
+# String columns stored as categorical codes
+SHOT_CATEGORICALS = ["event", "secondaryType"]
+
+# Column order of the original shots_df
+SHOT_COLUMNS = [
+    "season",
+    "game_id",
+    "team_id_for",
+    "team_id_against",
+    "event",
+    "secondaryType",
+    "st_x",
+    "st_y",
+]
+
+
+class ShotStore:
+    """
+    Typed columnar store for the shot events (shots, missed shots and goals)
+    used by the dashboard.
+
+    Seasons, game ids and team ids are kept as small integers, `event` and
+    `secondaryType` as int8 categorical codes (-1 for missing values) and
+    the rink coordinates `st_x`/`st_y` as float32.
+
+    Rows are kept sorted by (team_id_for, season, game_id) and `index` maps
+    every (team_id_for, season) pair to its contiguous row range, so the
+    dashboard filters only touch the rows of the selected team and season.
+    Arguments:
+    - columns: dictionary of column name -> numpy array (all of equal length)
+    - categories: dictionary of categorical column name -> list of labels
+    """
+
+    def __init__(self, columns, categories, index=None):
+        self.columns = columns
+        self.categories = categories
+        self.index = index if index is not None else self._build_index()
+
+    def _build_index(self):
+        """Sort rows by (team_id_for, season, game_id) if needed and return
+        the dictionary (team_id_for, season) -> (start, stop)"""
+        team = self.columns["team_id_for"]
+        season = self.columns["season"]
+        game = self.columns["game_id"]
+
+        key = team.astype(np.int64) * 2**16 + season.astype(np.int64)
+        step = np.diff(key)
+        if np.any(step < 0) or np.any(np.diff(game)[step == 0] < 0):
+            order = np.lexsort((game, season, team))
+            self.columns = {name: col[order] for name, col in self.columns.items()}
+            team = self.columns["team_id_for"]
+            season = self.columns["season"]
+            key = key[order]
+
+        starts = np.r_[0, np.flatnonzero(np.diff(key)) + 1]
+        stops = np.r_[starts[1:], len(key)]
+        return {
+            (int(team[start]), int(season[start])): (int(start), int(stop))
+            for start, stop in zip(starts, stops)
+            if stop > start
+        }
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build a store from a shots dataframe with object/string columns,
+        as produced in `Notebooks/SettingUpDash.ipynb`"""
+        import pandas as pd
+
+        columns = {}
+        categories = {}
+
+        for name, dtype in SHOT_DTYPES.items():
+            columns[name] = pd.to_numeric(df[name]).to_numpy(dtype=dtype)
+        for name, dtype in SHOT_EXTRA_DTYPES.items():
+            if name in df:
+                columns[name] = pd.to_numeric(df[name]).to_numpy(dtype=dtype)
+
+        for name in SHOT_CATEGORICALS:
+            cat = pd.Categorical(df[name])
+            columns[name] = cat.codes.astype(np.int8)
+            categories[name] = list(cat.categories)
+
+        return cls(columns, categories)
+
+    @classmethod
+    def from_pickle(cls, path):
+        """Convert the legacy pickled shots dataframe (`shots_df.data`)"""
+        import pandas as pd
+
+        return cls.from_frame(pd.read_pickle(path))
+
+    @classmethod
+    def load(cls, directory):
+        """Open a store saved with `save`. Columns are memory mapped and the
+        partition index is read from the manifest, so no row is touched."""
+        table = MappedTable(directory)
+        columns = {name: table.column(name) for name in table.names}
+        index = {
+            (team, season): (start, stop)
+            for team, season, start, stop in table.meta["index"]
+        }
+        return cls(columns, table.categories, index)
+
+    def save(self, directory):
+        """Save as a memory-mappable table (see asset_store.py)"""
+        write_table(
+            directory,
+            self.columns,
+            self.categories,
+            meta={"index": [[*key, *rows] for key, rows in self.index.items()]},
+        )
+
+    def concat(self, other):
+        """
+        New store with the rows of this store followed by those of `other`
+        (rows are sorted again). Categorical codes are translated to the
+        union of both stores' labels. A float column missing from one of the
+        stores (e.g. `xg` of shots not scored yet) is filled with NaN.
+        """
+        columns = {}
+        categories = {}
+        for name in {**self.columns, **other.columns}:
+            if name not in self.categories:
+                parts = []
+                for store in [self, other]:
+                    if name in store.columns:
+                        parts.append(store.columns[name])
+                    elif SHOT_EXTRA_DTYPES.get(name) == np.float32:
+                        parts.append(np.full(len(store), np.nan, dtype=np.float32))
+                    else:
+                        raise KeyError(f"{name} is missing from one of the stores")
+                columns[name] = np.concatenate(parts)
+                continue
+            labels = sorted(set(self.categories[name]) | set(other.categories[name]))
+            codes = []
+            for store in [self, other]:
+                # The extra -1 entry keeps missing values (code -1) missing
+                remap = [labels.index(label) for label in store.categories[name]]
+                codes.append(np.array(remap + [-1], dtype=np.int8)[store.columns[name]])
+            columns[name] = np.concatenate(codes)
+            categories[name] = labels
+        return ShotStore(columns, categories)
+
+    def __len__(self):
+        return len(self.columns["game_id"])
+
+    @property
+    def nbytes(self):
+        """Memory used by the column arrays, in bytes"""
+        return sum(col.nbytes for col in self.columns.values())
+
+    def encode(self, column, value):
+        """Translate `value` to the stored representation of `column`,
+        or None if no row can hold it (e.g. unknown label or empty dropdown)"""
+        if column in self.categories:
+            if value in self.categories[column]:
+                return self.categories[column].index(value)
+            return None
+        try:
+            return self.columns[column].dtype.type(value)
+        except (TypeError, ValueError, OverflowError):
+            return None
+
+    def mask(self, **conditions):
+        """Boolean mask of the rows where every `column=value` condition holds"""
+        mask = np.ones(len(self), dtype=bool)
+        for column, value in conditions.items():
+            code = self.encode(column, value)
+            if code is None:
+                return np.zeros(len(self), dtype=bool)
+            mask &= self.columns[column] == code
+        return mask
+
+    def partition(self, team_id, season):
+        """Row range (slice) of the shots taken by `team_id` in `season`"""
+        key = (self.encode("team_id_for", team_id), self.encode("season", season))
+        start, stop = self.index.get(key, (0, 0))
+        return slice(start, stop)
+
+    def selection(self, team_id, season):
+        """Compact, JSON-serializable handle of a (team, season) selection:
+        the ids and the row range of its partition"""
+        rows = self.partition(team_id, season)
+        return {
+            "team_id": team_id,
+            "season": season,
+            "start": rows.start,
+            "stop": rows.stop,
+        }
+
+    def rows(self, selection):
+        """Row range (slice) of a `selection` handle"""
+        return slice(selection["start"], selection["stop"])
+
+    def locate(self, **conditions):
+        """
+        Rows matching all `column=value` conditions, as a slice or index array.
+        When both `team_id_for` and `season` are given, only the rows of their
+        partition are scanned: `game_id` is located by binary search (games are
+        sorted inside a partition) and the remaining conditions are checked on
+        the partition rows only.
+        """
+        if "team_id_for" not in conditions or "season" not in conditions:
+            return np.flatnonzero(self.mask(**conditions))
+
+        rows = self.partition(conditions.pop("team_id_for"), conditions.pop("season"))
+        return self.locate_in(rows, **conditions)
+
+    def locate_in(self, rows, **conditions):
+        """Rows of the partition range `rows` (a slice, see `partition`)
+        matching all `column=value` conditions, as in `locate`"""
+        if "game_id" in conditions:
+            game = self.encode("game_id", conditions.pop("game_id"))
+            if game is None:
+                return slice(0, 0)
+            games = self.columns["game_id"][rows]
+            rows = slice(
+                rows.start + np.searchsorted(games, game, side="left"),
+                rows.start + np.searchsorted(games, game, side="right"),
+            )
+
+        if not conditions:
+            return rows
+
+        mask = np.ones(rows.stop - rows.start, dtype=bool)
+        for column, value in conditions.items():
+            code = self.encode(column, value)
+            if code is None:
+                return slice(0, 0)
+            mask &= self.columns[column][rows] == code
+        return rows.start + np.flatnonzero(mask)
+
+    def frame(self, rows=slice(None)):
+        """Materialize the selected `rows` (mask, index array or slice) as a
+        dataframe with the columns of the original shots_df, followed by the
+        optional columns of the store"""
+        import pandas as pd
+
+        extra = [name for name in SHOT_EXTRA_DTYPES if name in self.columns]
+        data = {}
+        for name in SHOT_COLUMNS + extra:
+            col = self.columns[name][rows]
+            if name in self.categories:
+                col = pd.Categorical.from_codes(col, self.categories[name])
+            data[name] = col
+        return pd.DataFrame(data)
+
+    def select(self, **conditions):
+        """Dataframe with the rows matching all `column=value` conditions"""
+        return self.frame(self.locate(**conditions))
+
+    def select_in(self, selection, **conditions):
+        """Dataframe with the rows of a `selection` handle matching all
+        `column=value` conditions. Only the row range of the handle is
+        scanned, its partition is not looked up again"""
+        return self.frame(self.locate_in(self.rows(selection), **conditions))
+
+
+### Convert the legacy pickle
+# Usage: python shot_store.py [assets/shots_df.data] [assets/shots]
+if __name__ == "__main__":
+    import pandas as pd
+
+    src = sys.argv[1] if len(sys.argv) > 1 else "assets/shots_df.data"
+    dst = sys.argv[2] if len(sys.argv) > 2 else "assets/shots"
+
+    df = pd.read_pickle(src)
+    store = ShotStore.from_frame(df)
+    store.save(dst)
+
+    before = df.memory_usage(deep=True).sum()
+    print(f"{len(store)} shots: {before / 1e6:.1f} MB -> {store.nbytes / 1e6:.1f} MB")
@@ -0,0 +1,219 @@
+import argparse
+import sqlite3
+import threading
+
+import numpy as np
+
+from shot_store import SHOT_CATEGORICALS, SHOT_COLUMNS, SHOT_DTYPES
+
+# Covering indexes for the dashboard filters: the shot queries below are
+# answered from the index alone, without reading the game_plays rows
+SHOT_INDEXES = {
+    # team/season (as a game_id range)/game, then event or type filters
+    "idx_game_plays_team_game": [
+        "team_id_for",
+        "game_id",
+        "event",
+        "secondaryType",
+        "x",
+        "y",
+        "team_id_against",
+        "st_x",
+        "st_y",
+    ],
+}
+
+# Shots of the dashboard (see SHOTS_QUERY in build_assets.py). Seasons are
+# filtered as game_id ranges, since game ids start with the season's year
+QUERY_COLUMNS = [name for name in SHOT_COLUMNS if name != "season"]
+SHOTS_QUERY = f"""
+SELECT
+    {", ".join(QUERY_COLUMNS)}
+FROM
+    game_plays
+WHERE
+    event IN ('Goal', 'Shot', 'Missed Shot')
+    AND
+        (x <> 'NA' AND y <> 'NA')
+"""
+
+
+# Season of a game as an SQL expression (game ids start with the season's year)
+SEASON_SQL = "CAST(game_id AS INTEGER) / 1000000"
+
+
+def create_indexes(database):
+    """Create the covering indexes of the shot queries (needs write access)"""
+    con = sqlite3.connect(database)
+    for name, columns in SHOT_INDEXES.items():
+        con.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON game_plays ({', '.join(columns)})"
+        )
+    con.execute("ANALYZE game_plays")
+    con.commit()
+    con.close()
+
+
+class SqlShotStore:
+    """
+    Shot filters of the dashboard served from the SQLite database instead
+    of the in-memory ShotStore, with the same `select` interface. Queries
+    are parameterized and use the covering indexes of `create_indexes`.
+    Every thread gets its own read-only connection (sqlite3 connections can
+    not be shared between threads).
+    Arguments:
+    - database: path of nhl-data.db
+    - categories (optional): labels of the `event` and `secondaryType`
+      columns, used for the categorical columns of the returned dataframes.
+      Read from the database (sorted, as in ShotStore) when not given
+    """
+
+    def __init__(self, database, categories=None):
+        self.database = database
+        self._local = threading.local()
+        self.categories = (
+            categories if categories is not None else self.read_categories()
+        )
+
+    @property
+    def connection(self):
+        """Read-only connection of the current thread"""
+        con = getattr(self._local, "connection", None)
+        if con is None:
+            con = sqlite3.connect(f"file:{self.database}?mode=ro", uri=True)
+            self._local.connection = con
+        return con
+
+    def read_categories(self):
+        """Sorted labels of the categorical columns over all the shots"""
+        return {
+            name: [
+                label
+                for (label,) in self.connection.execute(
+                    f"SELECT DISTINCT {name} FROM ({SHOTS_QUERY}) "
+                    f"WHERE {name} IS NOT NULL ORDER BY {name}"
+                )
+            ]
+            for name in SHOT_CATEGORICALS
+        }
+
+    def counts(self, *columns):
+        """
+        Number of shots per distinct value of `columns` (names of
+        SHOT_COLUMNS, "season" included), with one GROUP BY query. The
+        precomputed tables of the dashboard (OptionsCatalogue, GameSummary,
+        ShotDensity) are built from these instead of the shots.
+        """
+        names = [SEASON_SQL if name == "season" else name for name in columns]
+        sql = (
+            f"SELECT {', '.join(names)}, COUNT(*) FROM ({SHOTS_QUERY}) "
+            f"GROUP BY {', '.join(names)}"
+        )
+        rows = self.connection.execute(sql).fetchall()
+        values = list(zip(*rows)) if rows else [()] * (len(columns) + 1)
+        return ShotCounts(dict(zip([*columns, "count"], values)), self.categories)
+
+    def query(self, **conditions):
+        """SQL query and parameters for the `column=value` conditions"""
+        sql = SHOTS_QUERY
+        params = []
+        for column, value in conditions.items():
+            if column == "season":
+                sql += "    AND game_id BETWEEN ? AND ?\n"
+                params += [int(value) * 1000000, (int(value) + 1) * 1000000 - 1]
+            elif column in SHOT_COLUMNS:
+                sql += f"    AND {column} = ?\n"
+                params.append(value)
+            else:
+                raise KeyError(column)
+        return sql, params
+
+    def selection(self, team_id, season):
+        """Handle of a (team, season) selection (see ShotStore.selection)"""
+        return {"team_id": team_id, "season": season}
+
+    def select_in(self, selection, **conditions):
+        """Dataframe with the rows of a `selection` handle matching all
+        `column=value` conditions (see ShotStore.select_in)"""
+        return self.select(
+            season=selection["season"], team_id_for=selection["team_id"], **conditions
+        )
+
+    def select(self, **conditions):
+        """Dataframe with the rows matching all `column=value` conditions,
+        with the same columns and dtypes as ShotStore.select"""
+        import pandas as pd
+
+        # No row can match an empty dropdown (None season, team...)
+        if any(value is None for value in conditions.values()):
+            rows = []
+        else:
+            sql, params = self.query(**conditions)
+            rows = self.connection.execute(sql, params).fetchall()
+        values = dict(zip(QUERY_COLUMNS, zip(*rows))) if rows else {}
+
+        data = {}
+        for name in SHOT_COLUMNS:
+            if name == "season":
+                game = np.array(values.get("game_id", []), dtype=np.int64)
+                data[name] = (game // 1000000).astype(SHOT_DTYPES[name])
+            elif name in SHOT_CATEGORICALS:
+                data[name] = pd.Categorical(
+                    values.get(name, []), categories=self.categories[name]
+                )
+            else:
+                data[name] = pd.to_numeric(
+                    pd.Series(values.get(name, []), dtype=object)
+                ).to_numpy(dtype=SHOT_DTYPES[name])
+        return pd.DataFrame(data)
+
+
+class ShotCounts:
+    """
+    Number of shots (`count` column) per distinct value of some shot
+    columns, as returned by SqlShotStore.counts. Has the `columns`,
+    `categories` and `encode` of a ShotStore, with the same dtypes and
+    categorical codes, and the rows sorted by the columns.
+    Arguments:
+    - values: dictionary of column name -> values, with the `count` column
+    - categories: labels of the categorical columns
+    """
+
+    def __init__(self, values, categories):
+        import pandas as pd
+
+        names = [name for name in values if name != "count"]
+        self.categories = categories
+        self.columns = {}
+        for name in names:
+            if name in SHOT_CATEGORICALS:
+                codes = pd.Categorical(values[name], categories=categories[name])
+                self.columns[name] = codes.codes.astype(np.int8)
+            else:
+                self.columns[name] = pd.to_numeric(
+                    pd.Series(values[name], dtype=object)
+                ).to_numpy(dtype=SHOT_DTYPES[name])
+        self.columns["count"] = np.array(values["count"], dtype=np.int64)
+
+        order = np.lexsort([self.columns[name] for name in reversed(names)])
+        self.columns = {name: col[order] for name, col in self.columns.items()}
+
+    def __len__(self):
+        return len(self.columns["count"])
+
+    def encode(self, column, value):
+        """Categorical code of `value` in `column`, or None if unknown"""
+        if value in self.categories[column]:
+            return self.categories[column].index(value)
+        return None
+
+
+### Create the covering indexes of the SQL query mode
+# Usage: python sql_store.py nhl-data.db
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("database", help="SQLite database (nhl-data.db)")
+    args = parser.parse_args()
+
+    create_indexes(args.database)
+    print(f"=== Created indexes {', '.join(SHOT_INDEXES)}")
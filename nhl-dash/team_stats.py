@@ -0,0 +1,149 @@
+import argparse
+import sqlite3
+
+# Materialized per team and season aggregate of game_plays, kept in the
+# database so that the goal tables (and other season summaries) are lookups
+# into a small table instead of GROUP BY scans over game_plays
+TEAM_STATS_TABLE = """
+CREATE TABLE IF NOT EXISTS team_season_stats (
+	season INTEGER,
+	team_id INTEGER,
+	goals_for INTEGER,
+	goals_against INTEGER,
+	shots_for INTEGER,
+	missed_shots_for INTEGER,
+	PRIMARY KEY (season, team_id)
+);
+"""
+
+# High-water mark (largest game_id) of every materialized aggregate
+STATE_TABLE = """
+CREATE TABLE IF NOT EXISTS aggregate_state (
+	name TEXT PRIMARY KEY,
+	max_game_id INTEGER
+);
+"""
+
+# One scan of the plays of the games in (`?`, `?`]: counts per (season,
+# shooting team, defending team) are computed once and added to both teams'
+# rows, as "for" and "against" counts
+REFRESH_QUERY = """
+WITH pairs AS MATERIALIZED (
+	SELECT
+		CAST(SUBSTR(game_id, 1, 4) AS INTEGER) AS season,
+		CAST(team_id_for AS INTEGER) AS team_for,
+		CAST(team_id_against AS INTEGER) AS team_against,
+		SUM(event = 'Goal') AS goals,
+		SUM(event = 'Shot') AS shots,
+		SUM(event = 'Missed Shot') AS missed
+	FROM
+		game_plays
+	WHERE
+		event IN ('Goal', 'Shot', 'Missed Shot')
+		AND
+			game_id > ? AND game_id <= ?
+	GROUP BY
+		season, team_for, team_against
+)
+INSERT INTO team_season_stats
+SELECT
+	season, team_id,
+	SUM(goals_for), SUM(goals_against), SUM(shots_for), SUM(missed_shots_for)
+FROM (
+	SELECT
+		season, team_for AS team_id,
+		goals AS goals_for, 0 AS goals_against,
+		shots AS shots_for, missed AS missed_shots_for
+	FROM
+		pairs
+	UNION ALL
+	SELECT
+		season, team_against AS team_id,
+		0, goals, 0, 0
+	FROM
+		pairs
+)
+WHERE
+	team_id IS NOT NULL
+GROUP BY
+	season, team_id
+ON CONFLICT (season, team_id) DO UPDATE SET
+	goals_for = goals_for + excluded.goals_for,
+	goals_against = goals_against + excluded.goals_against,
+	shots_for = shots_for + excluded.shots_for,
+	missed_shots_for = missed_shots_for + excluded.missed_shots_for;
+"""
+
+# Aggregate table of the dashboard assets (see DashData.team_stats)
+TEAM_STATS_QUERY = """
+SELECT
+	*
+FROM
+	team_season_stats
+ORDER BY
+	team_id, season;
+"""
+
+# Goal tables of the dashboard (same columns as the notebook queries):
+# goals scored ("for") or conceded ("against") per season of every team
+GOALS_QUERY = """
+SELECT
+	CAST(stats.season AS TEXT) AS season,
+	team_info.team_id, team_info.shortName, team_info.teamName,
+	stats.goals_{side} AS {count},
+	CAST(stats.team_id AS TEXT) AS team_id_{side}
+FROM
+	team_season_stats AS stats
+INNER JOIN
+	team_info
+		ON stats.team_id = team_info.team_id
+WHERE
+	stats.goals_{side} > 0
+ORDER BY
+	stats.season, {count} DESC, team_info.team_id;
+"""
+
+
+def refresh_team_stats(con, full=False):
+    """
+    Create or update the team_season_stats table of the database `con`
+    (a writable connection) with the plays of the games added since the
+    last refresh, or of all the games if `full` is True. Returns the new
+    high-water mark (plays are loaded together with their game, so it is
+    taken from the small `game` table).
+    """
+    con.execute(TEAM_STATS_TABLE)
+    con.execute(STATE_TABLE)
+    if full:
+        with con:
+            con.execute("DELETE FROM team_season_stats")
+            con.execute("DELETE FROM aggregate_state WHERE name = 'team_season_stats'")
+
+    row = con.execute(
+        "SELECT max_game_id FROM aggregate_state WHERE name = 'team_season_stats'"
+    ).fetchone()
+    since = row[0] if row else 0
+    (max_game_id,) = con.execute(
+        "SELECT COALESCE(MAX(game_id), ?) FROM game", (since,)
+    ).fetchone()
+
+    # Counts and high-water mark in one transaction, so that a failed
+    # refresh can be run again without counting games twice
+    with con:
+        con.execute(REFRESH_QUERY, (since, max_game_id))
+        con.execute(
+            "INSERT OR REPLACE INTO aggregate_state VALUES ('team_season_stats', ?)",
+            (max_game_id,),
+        )
+    return max_game_id
+
+
+### Create or refresh the team_season_stats table of the database
+# Usage: python team_stats.py nhl-data.db
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("database", help="SQLite database (nhl-data.db)")
+    args = parser.parse_args()
+
+    con = sqlite3.connect(args.database)
+    print(f"=== team_season_stats up to game {refresh_team_stats(con)}")
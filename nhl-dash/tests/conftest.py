@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The dashboard modules are imported from the nhl-dash folder, as when the
+# app and the scripts are run from it
+DASH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DASH)
+
+# Team ids of the test database (10 sorts before 2 as text)
+TEAMS = {1: "New Jersey Devils", 2: "New York Islanders", 10: "Toronto Maple Leafs"}
+SEASONS = [2018, 2019]
+GAMES_PER_SEASON = 6
+SHOT_TYPES = ["Wrist Shot", "Slap Shot", "Backhand", "NA"]
+
+
+def nhl_tables(seed=0):
+    """
+    Small team_info, game and game_plays tables with the schema of the
+    Kaggle database (text columns, 'NA' coordinates, non-shot plays)
+    """
+    rng = np.random.default_rng(seed)
+    team_info = pd.DataFrame(
+        {
+            "team_id": list(TEAMS),
+            "shortName": [name.rsplit(" ", 2)[0] for name in TEAMS.values()],
+            "teamName": [name.split(" ", 2)[-1] for name in TEAMS.values()],
+        }
+    )
+
+    games = []
+    for season in SEASONS:
+        for k in range(GAMES_PER_SEASON):
+            home, away = rng.choice(list(TEAMS), 2, replace=False)
+            games.append(
+                {
+                    "game_id": season * 1000000 + 20001 + k,
+                    "season": f"{season}{season + 1}",
+                    "date_time_GMT": f"{season}-10-{k + 10:02d}T23:00:00Z",
+                    "away_team_id": int(away),
+                    "home_team_id": int(home),
+                    "venue": f"Arena {home}",
+                }
+            )
+    game = pd.DataFrame(games)
+
+    plays = []
+    for g in games:
+        teams = [g["home_team_id"], g["away_team_id"]]
+        for i in range(40):
+            side = rng.integers(2)
+            x, y = rng.integers(-99, 100), rng.integers(-42, 43)
+            missing = rng.random() < 0.05
+            plays.append(
+                {
+                    "play_id": f"{g['game_id']}_{i + 1}",
+                    "game_id": g["game_id"],
+                    "team_id_for": str(teams[side]),
+                    "team_id_against": str(teams[1 - side]),
+                    "event": rng.choice(["Goal", "Shot", "Missed Shot", "Faceoff"]),
+                    "secondaryType": rng.choice(SHOT_TYPES),
+                    "x": "NA" if missing else str(x),
+                    "y": "NA" if missing else str(y),
+                    "period": str(rng.integers(1, 4)),
+                    "periodType": "REGULAR",
+                    "periodTime": str(rng.integers(0, 1200)),
+                    "st_x": "NA" if missing else str(abs(x)),
+                    "st_y": "NA" if missing else str(y if x > 0 else -y),
+                }
+            )
+    game_plays = pd.DataFrame(plays)
+    return {"team_info": team_info, "game": game, "game_plays": game_plays}
+
+
+def write_database(path, tables, max_game_id=None):
+    """Append the tables to the SQLite database `path`, only the games (and
+    their plays) up to `max_game_id` if given, after the ones already in it"""
+    con = sqlite3.connect(path)
+    if not con.execute("SELECT name FROM sqlite_master WHERE name = 'game'").fetchone():
+        tables["team_info"].to_sql("team_info", con, index=False)
+        since = 0
+    else:
+        (since,) = con.execute("SELECT MAX(game_id) FROM game").fetchone()
+    for name in ["game", "game_plays"]:
+        df = tables[name]
+        rows = df["game_id"] > since
+        if max_game_id is not None:
+            rows &= df["game_id"] <= max_game_id
+        df[rows].to_sql(name, con, index=False, if_exists="append")
+    con.commit()
+    con.close()
+
+
+@pytest.fixture(scope="session")
+def database(tmp_path_factory):
+    """Path of the complete test database"""
+    path = str(tmp_path_factory.mktemp("db") / "nhl-data.db")
+    write_database(path, nhl_tables())
+    return path
+
+
+@pytest.fixture(scope="session")
+def assets(database, tmp_path_factory):
+    """Dashboard assets built from the test database"""
+    from build_assets import build
+
+    path = str(tmp_path_factory.mktemp("assets"))
+    build(database, path)
+    return path
@@ -0,0 +1,65 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from asset_store import MappedTable
+from build_assets import build, read_state
+from conftest import nhl_tables, write_database
+from shot_store import ShotStore
+
+TABLES = ["df_games", "df_teams_season", "df_teams_conceded", "team_season_stats"]
+
+
+def assert_same_assets(built, expected):
+    for name in TABLES:
+        pd.testing.assert_frame_equal(
+            MappedTable(os.path.join(built, name)).frame(),
+            MappedTable(os.path.join(expected, name)).frame(),
+        )
+
+    shots = ShotStore.load(os.path.join(built, "shots"))
+    expected_shots = ShotStore.load(os.path.join(expected, "shots"))
+    assert shots.columns.keys() == expected_shots.columns.keys()
+    for name, column in expected_shots.columns.items():
+        np.testing.assert_array_equal(shots.columns[name], column)
+    assert shots.categories == expected_shots.categories
+    assert shots.index == expected_shots.index
+
+    for name in ["counts.npy", "manifest.json"]:
+        with open(os.path.join(built, "shot_density", name), "rb") as f:
+            with open(os.path.join(expected, "shot_density", name), "rb") as g:
+                assert f.read() == g.read()
+
+    with open(os.path.join(built, "team_dict.data"), "rb") as f:
+        with open(os.path.join(expected, "team_dict.data"), "rb") as g:
+            assert pickle.load(f) == pickle.load(g)
+
+
+def test_incremental_build_matches_full_build(tmp_path):
+    tables = nhl_tables(seed=1)
+    database = str(tmp_path / "nhl-data.db")
+    incremental = str(tmp_path / "incremental")
+    full = str(tmp_path / "full")
+
+    # first season, then the games of the second one are added
+    write_database(database, tables, max_game_id=2019000000)
+    first = build(database, incremental)
+    write_database(database, tables)
+    state = build(database, incremental)
+    assert state["max_game_id"] > first["max_game_id"]
+    assert state["games"] == len(tables["game"])
+
+    build(database, full, full=True)
+    assert read_state(full)["shots"] == state["shots"]
+    assert_same_assets(incremental, full)
+
+
+def test_build_without_new_games(tmp_path):
+    database = str(tmp_path / "nhl-data.db")
+    write_database(database, nhl_tables(seed=2))
+    assets = str(tmp_path / "assets")  # created by the build
+
+    state = build(database, assets)
+    assert build(database, assets) == state
@@ -0,0 +1,118 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer, make_column_selector
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline, make_pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from forest import PRECISIONS, ForestModel, export_forest
+from xg import FEATURES, XGModel
+
+
+def shots(n, seed):
+    """Random shots with the model features and dtypes (see xg.FEATURES)"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            "season": rng.integers(2000, 2020, n),
+            "team_id_for": rng.integers(1, 31, n),
+            "team_id_against": rng.integers(1, 31, n),
+            "period": rng.integers(1, 4, n),
+            "periodTime": rng.integers(0, 1200, n),
+            "st_x": rng.uniform(-100, 100, n),
+            "st_y": rng.uniform(-45, 45, n),
+        }
+    ).astype(FEATURES)
+    # goals are more likely close to the net
+    near = np.hypot(89 - df["st_x"], df["st_y"]) < 20
+    event = np.where(rng.random(n) < np.where(near, 0.3, 0.05), "Goal", "Shot")
+    event[rng.random(n) < 0.3] = "Missed Shot"
+    return df, pd.Series(event, name="event")
+
+
+def fit(preprocess, X, y):
+    pipeline = Pipeline(
+        [
+            ("preprocess", preprocess),
+            (
+                "clf",
+                RandomForestClassifier(n_estimators=8, max_depth=8, random_state=0),
+            ),
+        ]
+    )
+    return pipeline.fit(X, y)
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    """Pipeline of PythonScripts/modeling.py (every feature is numeric, so
+    the categorical step has no column)"""
+    X, y = shots(3000, seed=0)
+    preprocess = ColumnTransformer(
+        transformers=[
+            (
+                "categorical",
+                make_pipeline(OneHotEncoder()),
+                make_column_selector(dtype_exclude="number"),
+            ),
+            (
+                "numeric",
+                make_pipeline(StandardScaler()),
+                make_column_selector(dtype_include="number"),
+            ),
+        ]
+    )
+    return fit(preprocess, X, y)
+
+
+@pytest.mark.parametrize("precision", PRECISIONS)
+def test_same_predictions(pipeline, tmp_path, precision):
+    export_forest(pipeline, str(tmp_path), precision)
+    forest = ForestModel(str(tmp_path))
+    X, _ = shots(2000, seed=1)
+
+    assert list(forest.classes_) == list(pipeline.classes_)
+    # every shot reaches the same leaf of every tree
+    Xt = pipeline[0].transform(X).astype(np.float32)
+    np.testing.assert_array_equal(
+        forest.apply(forest.transform(X)) - forest.roots, pipeline[-1].apply(Xt)
+    )
+    atol = 1e-12 if precision == "float64" else 1e-6
+    np.testing.assert_allclose(
+        forest.predict_proba(X), pipeline.predict_proba(X), rtol=0, atol=atol
+    )
+    np.testing.assert_array_equal(forest.predict(X), pipeline.predict(X))
+
+
+def test_one_hot_columns(tmp_path):
+    X, y = shots(3000, seed=2)
+    X["zone"] = np.where(X["st_x"] > 25, "offensive", "neutral")
+    preprocess = ColumnTransformer(
+        [
+            ("categorical", OneHotEncoder(handle_unknown="ignore"), ["zone"]),
+            ("numeric", StandardScaler(), list(FEATURES)),
+        ]
+    )
+    pipeline = fit(preprocess, X, y)
+    export_forest(pipeline, str(tmp_path))
+    forest = ForestModel(str(tmp_path))
+
+    X, _ = shots(1000, seed=3)
+    # unknown categories are encoded as all zeros by both
+    X["zone"] = np.where(X["st_x"] > 25, "offensive", "defensive")
+    np.testing.assert_allclose(
+        forest.predict_proba(X), pipeline.predict_proba(X), rtol=0, atol=1e-12
+    )
+
+
+def test_xg_model_loads_both(pipeline, tmp_path):
+    joblib.dump(pipeline, tmp_path / "best_rf.sav")
+    export_forest(pipeline, str(tmp_path / "best_rf"))
+    X, _ = shots(500, seed=4)
+
+    xg = XGModel(str(tmp_path / "best_rf.sav")).predict(X)
+    exported = XGModel(str(tmp_path / "best_rf"))
+    assert isinstance(exported.pipeline, ForestModel)
+    np.testing.assert_allclose(exported.predict(X), xg, rtol=0, atol=1e-6)
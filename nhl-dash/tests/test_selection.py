@@ -0,0 +1,97 @@
+import importlib.util
+import os
+
+import pandas as pd
+import pytest
+from dash import no_update
+
+import data
+from conftest import DASH, SEASONS, TEAMS
+from shot_store import ShotStore
+
+SELECTIONS = [(team, season) for team in TEAMS for season in SEASONS]
+
+
+@pytest.fixture(scope="module")
+def store(assets):
+    return ShotStore.load(os.path.join(assets, "shots"))
+
+
+@pytest.fixture(scope="module")
+def app(assets):
+    """The app module, with its data read from the test assets"""
+    cwd = os.getcwd()
+    os.chdir(DASH)  # the rink image path is relative to nhl-dash
+    data._data = data.DashData(assets)
+    spec = importlib.util.spec_from_file_location(
+        "nhl_dash_app", os.path.join(DASH, "nhl-dash-app-modular.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    yield module
+    data._data = None
+    os.chdir(cwd)
+
+
+@pytest.mark.parametrize("team, season", SELECTIONS)
+def test_selection_rows(store, team, season):
+    selection = store.selection(team, season)
+    rows = store.rows(selection)
+    assert rows == store.partition(team, season)
+
+    df = store.frame(rows)
+    assert (df["team_id_for"] == team).all()
+    assert (df["season"] == season).all()
+    assert len(df) == len(store.select(team_id_for=team, season=season))
+
+
+@pytest.mark.parametrize("team, season", SELECTIONS)
+def test_select_in(store, team, season):
+    selection = store.selection(team, season)
+    for conditions in [
+        {},
+        {"secondaryType": "Wrist Shot"},
+        {"event": "Goal"},
+        {"game_id": int(store.frame(store.rows(selection))["game_id"].iloc[0])},
+    ]:
+        pd.testing.assert_frame_equal(
+            store.select_in(selection, **conditions),
+            store.select(team_id_for=team, season=season, **conditions),
+        )
+
+
+def test_update_selection(app, store):
+    for team, season in SELECTIONS:
+        selection = app.update_selection(team, season, None)
+        assert selection == store.selection(team, season)
+        # unchanged selections do not trigger the callbacks again
+        assert app.update_selection(team, season, selection) is no_update
+
+
+def test_callbacks_use_the_selection(app, store):
+    summary = data.get_data().summary
+    for team, season in SELECTIONS:
+        selection = app.update_selection(team, season, None)
+
+        shots = store.select(team_id_for=team, season=season, secondaryType="Backhand")
+        figure = app.scatter_figure(selection, "Backhand", "all", None)
+        assert f"<sup>{len(shots)} shots" in figure["layout"]["title"]["text"]
+
+        options, _ = app.update_game_dropdown(selection, None)
+        games = [o["value"] for o in options if o["value"] != "all"]
+        assert games == sorted(store.frame(store.rows(selection))["game_id"].unique())
+
+        for game in games:
+            shots = store.select(
+                team_id_for=team, season=season, secondaryType="Backhand", game_id=game
+            )
+            figure = app.scatter_figure(selection, "Backhand", game, None)
+            assert f"<sup>{len(shots)} shots" in figure["layout"]["title"]["text"]
+
+            expected = summary.for_team(game, team)
+            score = app.get_score(game, selection)
+            assert score[0].children == (
+                f"{expected['goals_for']} x {expected['goals_against']}"
+            )
+            card = app.get_team_against_card(selection, game)
+            assert card.children[0].src.endswith(f"/{expected['team_against']}.png")
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from asset_store import MappedTable
+from conftest import SEASONS, TEAMS
+from density import ShotDensity
+from games import GameIndex, GameSummary
+from options import OptionsCatalogue
+from shot_store import SHOT_COLUMNS, ShotStore
+from sql_store import SqlShotStore, create_indexes
+
+
+@pytest.fixture(scope="module")
+def store(assets):
+    return ShotStore.load(os.path.join(assets, "shots"))
+
+
+@pytest.fixture(scope="module")
+def sql(database):
+    create_indexes(database)
+    return SqlShotStore(database)
+
+
+def sorted_shots(df):
+    """Shots of `df` in a canonical order (the database returns them in
+    index order)"""
+    return df[SHOT_COLUMNS].sort_values(SHOT_COLUMNS).reset_index(drop=True)
+
+
+def test_categories(store, sql):
+    assert sql.categories == store.categories
+
+
+@pytest.mark.parametrize("team", TEAMS)
+@pytest.mark.parametrize("season", SEASONS)
+def test_select(store, sql, team, season):
+    games = store.frame(store.partition(team, season))["game_id"].unique()
+    for conditions in [
+        {},
+        {"secondaryType": "Wrist Shot"},
+        {"secondaryType": "Unknown"},
+        {"event": "Goal", "game_id": int(games[0])},
+        {"secondaryType": None},
+    ]:
+        conditions = {"team_id_for": team, "season": season, **conditions}
+        expected = sorted_shots(store.select(**conditions))
+        pd.testing.assert_frame_equal(sorted_shots(sql.select(**conditions)), expected)
+
+        selection = sql.selection(team, season)
+        del conditions["team_id_for"], conditions["season"]
+        pd.testing.assert_frame_equal(
+            sorted_shots(sql.select_in(selection, **conditions)), expected
+        )
+
+
+def test_tables_from_counts(store, sql, assets):
+    games = GameIndex(MappedTable(os.path.join(assets, "df_games")).frame())
+
+    options = OptionsCatalogue(sql.counts("team_id_for", "season", "game_id"), games)
+    expected = OptionsCatalogue(store, games)
+    assert options._games == expected._games
+    assert options._seasons == expected._seasons
+
+    summary = GameSummary(games, sql.counts("game_id", "team_id_for", "event"))
+    expected = GameSummary(games, store)
+    for name, column in expected.columns.items():
+        np.testing.assert_array_equal(summary.columns[name], column)
+
+    density = ShotDensity.from_store(
+        sql.counts("season", "team_id_for", "event", "st_x", "st_y")
+    )
+    expected = ShotDensity.from_store(store)
+    np.testing.assert_array_equal(density.counts, expected.counts)
+    assert density.seasons == expected.seasons
+    assert density.teams == expected.teams
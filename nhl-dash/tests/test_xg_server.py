@@ -0,0 +1,102 @@
+import http.client
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from xg import FEATURES, MicroBatcher, shot_frame
+from xg_server import XGHandler, XGServer
+
+SHOT = {
+    "season": 2019,
+    "team_id_for": 20,
+    "team_id_against": 6,
+    "period": 1,
+    "periodTime": 300,
+    "st_x": 80,
+    "st_y": 5,
+}
+
+
+class StubModel:
+    """xG of 0.25 for every shot, or an error when `fail` is set"""
+
+    fail = False
+
+    def predict(self, shots):
+        if self.fail:
+            raise RuntimeError("boom")
+        return np.full(len(shots), 0.25, dtype=np.float32)
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = XGServer(("127.0.0.1", 0), XGHandler)
+    server.batcher = MicroBatcher(StubModel())
+    server.verbose = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, body, path="/xg"):
+    """Status and decoded JSON answer of a POST with the raw `body`"""
+    con = http.client.HTTPConnection(*server.server_address)
+    con.request("POST", path, body=body)
+    response = con.getresponse()
+    answer = response.status, json.loads(response.read())
+    con.close()
+    return answer
+
+
+def test_scores_records_and_columns(server):
+    assert post(server, json.dumps({"shots": [SHOT, SHOT]})) == (
+        200,
+        {"xg": [0.25, 0.25]},
+    )
+    columns = {name: [value] for name, value in SHOT.items()}
+    assert post(server, json.dumps({"shots": columns})) == (200, {"xg": [0.25]})
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        "not json",
+        json.dumps({"records": [SHOT]}),
+        json.dumps({"shots": [{**SHOT, "st_x": "far"}]}),
+        json.dumps({"shots": [{**SHOT, "st_x": None}]}),
+        json.dumps({"shots": [{**SHOT, "season": 99999}]}),
+        json.dumps({"shots": [{**SHOT, "period": 1.5}]}),
+        json.dumps({"shots": [{k: v for k, v in SHOT.items() if k != "st_y"}]}),
+        json.dumps({"shots": 3}),
+    ],
+)
+def test_malformed_requests(server, body):
+    status, answer = post(server, body)
+    assert status == 400
+    assert "error" in answer
+
+
+def test_unknown_path(server):
+    assert post(server, json.dumps({"shots": [SHOT]}), path="/other")[0] == 404
+
+
+def test_model_failure(server):
+    server.batcher.model.fail = True
+    try:
+        assert post(server, json.dumps({"shots": [SHOT]})) == (
+            500,
+            {"error": "model failed: boom"},
+        )
+    finally:
+        server.batcher.model.fail = False
+    assert post(server, json.dumps({"shots": [SHOT]}))[0] == 200
+
+
+def test_shot_frame_dtypes():
+    df = shot_frame([SHOT])
+    assert list(df.columns) == list(FEATURES)
+    assert df.dtypes.astype(str).to_dict() == FEATURES
+    assert len(shot_frame([])) == 0
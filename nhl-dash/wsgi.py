@@ -0,0 +1,19 @@
+import gc
+import importlib
+
+from CONSTANTS import PRELOAD
+from data import get_data
+
+# WSGI entry point: gunicorn -c gunicorn.conf.py wsgi:server
+# (the app module name has dashes, so it is imported by name)
+app = importlib.import_module("nhl-dash-app-modular").app
+server = app.server
+
+# With gunicorn's preload_app this runs once in the master process: the data
+# is loaded (memory-mapped tables, plus the small derived indexes) before the
+# workers are forked, so they all share one copy. Freezing the objects
+# created so far keeps the garbage collector from writing to their pages
+# (which would give every worker a private copy of them).
+if PRELOAD:
+    get_data().preload()
+    gc.freeze()
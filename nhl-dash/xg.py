@@ -0,0 +1,157 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from CONSTANTS import XG_MODEL
+
+# Features of the model, in the column order and dtypes of the training
+# data (see PythonScripts/modeling.py)
+FEATURES = {
+    "season": "int16",
+    "team_id_for": "int16",
+    "team_id_against": "int16",
+    "period": "int8",
+    "periodTime": "int16",
+    "st_x": "float32",
+    "st_y": "float32",
+}
+
+
+def shot_frame(shots):
+    """
+    Dataframe of model features from `shots`: a dataframe, a list of
+    records or a dict of columns (extra columns are ignored). Raises
+    KeyError for a missing feature and ValueError for a value that is not
+    numeric, missing, infinite or out of the range of the feature's dtype
+    (instead of casting it to a wrapped-around or NaN feature).
+    """
+    df = shots if isinstance(shots, pd.DataFrame) else pd.DataFrame(shots)
+    if len(df) == 0:
+        df = pd.DataFrame(columns=list(FEATURES))
+
+    columns = {}
+    for name, dtype in FEATURES.items():
+        values = pd.to_numeric(df[name]).to_numpy(dtype=np.float64)
+        if not np.isfinite(values).all():
+            raise ValueError(f"{name}: missing or non-finite value")
+        if np.issubdtype(dtype, np.integer):
+            info = np.iinfo(dtype)
+            if np.any(values != np.round(values)):
+                raise ValueError(f"{name}: non-integer value")
+        else:
+            info = np.finfo(dtype)
+        if np.any((values < info.min) | (values > info.max)):
+            raise ValueError(f"{name}: value out of the {dtype} range")
+        columns[name] = values.astype(dtype)
+    return pd.DataFrame(columns)
+
+
+class XGModel:
+    """
+    Expected goals of shots: probability of the "Goal" class of the tuned
+    pipeline. The model is loaded once and every call scores a whole batch
+    of shots with one `predict_proba`.
+    Arguments:
+    - path: joblib file of the pipeline (best_rf.sav), or a folder with the
+      pipeline exported by forest.py (loaded without scikit-learn)
+    """
+
+    def __init__(self, path=XG_MODEL):
+        self.path = path
+        if os.path.isdir(path):
+            from forest import ForestModel
+
+            self.pipeline = ForestModel(path)
+        else:
+            import joblib
+
+            self.pipeline = joblib.load(path)
+        self.goal = list(self.pipeline.classes_).index("Goal")
+
+    def predict(self, shots):
+        """float32 array with the xG of every shot (see `shot_frame`)"""
+        features = shot_frame(shots)
+        if features.empty:
+            return np.empty(0, dtype=np.float32)
+        proba = self.pipeline.predict_proba(features)
+        return proba[:, self.goal].astype(np.float32)
+
+
+@lru_cache(maxsize=1)
+def load_model(path):
+    """XGModel of `path`, loaded once per process"""
+    return XGModel(path)
+
+
+def predict_with(path, shots):
+    """xG of `shots` with the model of `path` (for worker processes, which
+    load the model on their first task and keep it for the next ones)"""
+    return load_model(path).predict(shots)
+
+
+class MicroBatcher:
+    """
+    Groups the shots of concurrent callers into one model call: the first
+    request of a batch waits up to `max_wait` seconds for others (or until
+    `max_rows` shots are queued), then all of them are scored together by a
+    single worker thread and every caller gets its own rows back.
+    Arguments:
+    - model: XGModel (or any object with a `predict(shots)` method)
+    - max_wait: seconds a batch stays open for more requests
+    - max_rows: shots above which a batch is scored right away
+    """
+
+    def __init__(self, model, max_wait=0.005, max_rows=100_000):
+        self.model = model
+        self.max_wait = max_wait
+        self.max_rows = max_rows
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def predict(self, shots):
+        """xG of `shots`, scored together with the other pending requests.
+        Invalid shots raise here, in the caller's thread"""
+        features = shot_frame(shots)
+        future = Future()
+        self._queue.put((features, future))
+        return future.result()
+
+    def _batch(self):
+        """Pending requests of the next batch (blocks for the first one)"""
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+            rows += len(batch[-1][0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._batch()
+            try:
+                xg = self.model.predict(
+                    pd.concat([features for features, _ in batch], ignore_index=True)
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for features, future in batch:
+                future.set_result(xg[start : start + len(features)])
+                start += len(features)
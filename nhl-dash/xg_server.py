@@ -0,0 +1,101 @@
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from CONSTANTS import XG_MODEL
+from xg import FEATURES, MicroBatcher, XGModel, shot_frame
+
+# Pending connections queued by the listening socket. The default of
+# socketserver (5) resets connections when many clients arrive at once,
+# which is the load micro-batching is for
+BACKLOG = 128
+
+
+class XGServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer with a configurable listen backlog"""
+
+    def __init__(self, address, handler, backlog=BACKLOG):
+        self.request_queue_size = backlog
+        super().__init__(address, handler)
+
+
+class XGHandler(BaseHTTPRequestHandler):
+    """
+    POST /xg with a JSON body {"shots": ...}, the shots as a list of records
+    or as a dict of columns (see xg.FEATURES), answers {"xg": [...]} in the
+    same order. GET /features lists the expected columns.
+    Requests are handled in parallel threads and scored together by the
+    server's MicroBatcher (`self.server.batcher`).
+    """
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/features":
+            self.send_json(200, {"features": list(FEATURES)})
+        else:
+            self.send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/xg":
+            self.send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            shots = shot_frame(json.loads(self.rfile.read(length))["shots"])
+        except KeyError as e:
+            self.send_json(400, {"error": f"missing {e}"})
+            return
+        except (TypeError, ValueError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        try:
+            xg = self.server.batcher.predict(shots)
+        except Exception as e:
+            self.log_error("xG model failed: %r", e)
+            self.send_json(500, {"error": f"model failed: {e}"})
+        else:
+            self.send_json(200, {"xg": xg.tolist()})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def log_error(self, format, *args):
+        # errors are always logged, not only with --verbose
+        super().log_message(format, *args)
+
+
+### Serve the xG model over HTTP
+# Usage: python xg_server.py [--model ../SavedModels/best_rf.sav] [--port 8060]
+# curl -d '{"shots": [{"season": 2019, "team_id_for": 20, "team_id_against": 6,
+#   "period": 1, "periodTime": 300, "st_x": 80, "st_y": 5}]}' localhost:8060/xg
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=XG_MODEL)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8060)
+    parser.add_argument(
+        "--max-wait", type=float, default=5, help="ms a batch waits for requests"
+    )
+    parser.add_argument("--max-rows", type=int, default=100_000)
+    parser.add_argument(
+        "--backlog", type=int, default=BACKLOG, help="pending connections queued"
+    )
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    server = XGServer((args.host, args.port), XGHandler, args.backlog)
+    server.batcher = MicroBatcher(
+        XGModel(args.model), max_wait=args.max_wait / 1000, max_rows=args.max_rows
+    )
+    server.verbose = args.verbose
+    print(f"=== Serving {args.model} on http://{args.host}:{args.port}/xg")
+    server.serve_forever()